@@ -0,0 +1,104 @@
+"""
+HTTP service for splitting marksheets, alongside the Streamlit UI.
+
+POST a marksheet to /split and get the department/batch ZIP back. Each
+request is processed in a bounded process pool, so several uploads run in
+parallel on one machine. Requests beyond the pool are queued up to a
+limit, and get 503 once the queue is full. Workers stream the archive to
+a temporary file, which is then streamed to the client and removed, so
+neither side holds the whole ZIP in memory.
+
+Requires fastapi, uvicorn and python-multipart:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Environment:
+    MARKS_SPLITTING_WORKERS  Worker processes (default: number of CPUs)
+    MARKS_SPLITTING_QUEUE    Requests allowed to wait for a worker (default: 2 per worker)
+"""
+import asyncio
+import importlib.util
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+
+from app import iter_marksheet_zip
+
+MAX_WORKERS = int(os.environ.get('MARKS_SPLITTING_WORKERS', os.cpu_count() or 1))
+MAX_QUEUE = int(os.environ.get('MARKS_SPLITTING_QUEUE', 2 * MAX_WORKERS))
+
+# Errors meaning the upload is not a marksheet we can read, answered with
+# 422; anything else is a server error
+INVALID_MARKSHEET_ERRORS = (ValueError, zipfile.BadZipFile)
+if importlib.util.find_spec('python_calamine') is not None:
+    from python_calamine import CalamineError
+    INVALID_MARKSHEET_ERRORS += (CalamineError,)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    app.state.slots = asyncio.Semaphore(MAX_WORKERS + MAX_QUEUE)
+    try:
+        yield
+    finally:
+        app.state.executor.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title='Marks Splitting', lifespan=lifespan)
+
+
+def _write_marksheet_zip(data: bytes, file_extension: str, path: str) -> None:
+    """
+    Worker task: stream the department/batch ZIP for an upload into path.
+    The file is opened without creating it, so a task that starts after its
+    request was cancelled (and the file removed) doesn't leave one behind.
+    """
+    with open(path, 'r+b') as f:
+        for chunk in iter_marksheet_zip(data, file_extension):
+            f.write(chunk)
+
+
+@app.get('/health')
+async def health():
+    return {'status': 'ok', 'workers': MAX_WORKERS, 'queue': MAX_QUEUE}
+
+
+@app.post('/split')
+async def split(file: UploadFile = File(...)):
+    """Split an uploaded .xlsx/.csv marksheet into the department/batch ZIP."""
+    file_extension = (file.filename or '').rsplit('.', 1)[-1].lower()
+    if file_extension not in ('xlsx', 'csv'):
+        raise HTTPException(415, 'Unsupported file format. Upload an .xlsx or .csv file.')
+
+    slots = app.state.slots
+    if slots.locked():
+        raise HTTPException(503, 'Server busy, try again shortly.')
+
+    async with slots:
+        fd, zip_path = tempfile.mkstemp(suffix='.zip')
+        os.close(fd)
+        try:
+            data = await file.read()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(app.state.executor, _write_marksheet_zip,
+                                       data, file_extension, zip_path)
+        except INVALID_MARKSHEET_ERRORS as e:
+            os.remove(zip_path)
+            raise HTTPException(422, f'Could not process marksheet: {e}')
+        except BaseException:
+            # Cancelled (e.g. the client went away) or failed on a bug. A
+            # worker already running keeps its open file until it finishes,
+            # but the name is gone and the space is freed when it closes it
+            os.remove(zip_path)
+            raise
+
+    stem = (file.filename or 'marksheet').rsplit('.', 1)[0]
+    return FileResponse(zip_path, media_type='application/zip',
+                        filename=f'{stem}_department_batches.zip',
+                        background=BackgroundTask(os.remove, zip_path))
@@ -1,202 +1,1884 @@
-import pandas as pd
-import openpyxl
-import zipfile
-import io
-import streamlit as st
-from typing import Tuple, Optional
-
-def process_marks(marks: str) -> Tuple[Optional[int], Optional[int], Optional[int]]:
-    """
-    Process marks string and return internal, external, and total marks.
-    Handles both formats: '040+043' and '040'
-    
-    Args:
-        marks: String containing marks in either 'internal+external' or single total format
-        
-    Returns:
-        Tuple of (internal, external, total) marks, or (None, None, None) if invalid
-    """
-    if not marks:
-        return None, None, None
-        
-    if isinstance(marks, (int, float)):
-        total = int(marks)
-        return None, None, total
-    
-    marks_str = str(marks).strip()
-    
-    try:
-        if '+' in marks_str:
-            internal, external = marks_str.split('+')
-            internal_val = int(internal.lstrip('0') or '0')
-            external_val = int(external.lstrip('0') or '0')
-            return internal_val, external_val, internal_val + external_val
-        else:
-            total = int(marks_str.lstrip('0') or '0')
-            return None, None, total
-            
-    except (ValueError, TypeError):
-        return None, None, None
-
-def process_excel_file(df: pd.DataFrame) -> openpyxl.Workbook:
-    """
-    Process the uploaded file (Excel or CSV) and add internal/external/total columns.
-    
-    Args:
-        df: Input DataFrame with marksheet data
-        
-    Returns:
-        Processed openpyxl Workbook
-    """
-    # Calculate the number of subjects based on the remaining columns after the first 3
-    total_columns = len(df.columns)
-    num_subjects = (total_columns - 3) // 4  # Assuming 4 columns per subject (Code, Name, Marks, Result)
-    
-    # Generate headers dynamically
-    headers = ['Register No', 'Name', 'College ID']
-    for i in range(1, num_subjects + 1):
-        headers.extend([f'Subject Code {i}', f'Subject Name {i}', 
-                        f'Marks {i}', f'Result {i}'])
-    
-    # If there are extra columns, add them as unnamed columns
-    extra_cols = total_columns - len(headers)
-    if extra_cols > 0:
-        headers.extend([f'Unnamed: {i}' for i in range(extra_cols)])
-    
-    # Assign headers to DataFrame
-    df.columns = headers
-    
-    # Convert to openpyxl workbook
-    temp_path = 'temp_workbook.xlsx'
-    df.to_excel(temp_path, index=False)
-    workbook = openpyxl.load_workbook(temp_path)
-    sheet = workbook.active
-    
-    # Process marks and insert columns
-    start_col = 4  # Starting after 'Register No', 'Name', 'College ID'
-    for subject_num in range(num_subjects):
-        marks_col = start_col + (subject_num * 7) + 2  # Position of Marks column
-        insert_col = marks_col + 1
-        
-        # Insert columns for Internal, External, Total
-        sheet.insert_cols(insert_col, 3)
-        for idx, col_name in enumerate(['Internal', 'External', 'Total']):
-            sheet.cell(row=1, column=insert_col + idx, 
-                      value=f'{col_name} {subject_num + 1}')
-        
-        # Process marks for each row
-        for row in range(2, sheet.max_row + 1):
-            marks = sheet.cell(row=row, column=marks_col).value
-            internal, external, total = process_marks(marks)
-            
-            values = [
-                internal if internal is not None else '',
-                external if external is not None else '',
-                total if total is not None else ''
-            ]
-            for col_offset, value in enumerate(values):
-                sheet.cell(row=row, column=insert_col + col_offset, value=value)
-    
-    # Auto-adjust column widths
-    for column in sheet.columns:
-        max_length = max(len(str(cell.value or "")) for cell in column)
-        sheet.column_dimensions[column[0].column_letter].width = max_length + 2
-    
-    return workbook
-
-def create_department_batches(workbook: openpyxl.Workbook) -> io.BytesIO:
-    """
-    Create batch-wise Excel files for each department.
-    
-    Args:
-        workbook: Processed workbook containing all marks
-        
-    Returns:
-        BytesIO object containing zipped department/batch files
-    """
-    department_codes = {
-        '28M': 'Data Science', '25F': 'BBA', '25N': 'BBAIB',
-        '2AA': 'BCom', '2AK': 'BComPA', '26U': 'Psychology',
-        '22S': 'Viscom', '21C': 'Economics', '21G': 'Tamil',
-        '31B': 'MSW', '21B': 'Political Science', 
-        '31M': 'M. Political Science'
-    }
-    
-    sheet = workbook.active
-    headers = [cell.value for cell in sheet[1]]
-    batch_workbooks = {}
-    
-    # Categorize rows by department and batch
-    for row in range(2, sheet.max_row + 1):
-        register_no = sheet.cell(row=row, column=1).value
-        if not isinstance(register_no, str):
-            continue  # Skip rows with invalid register numbers
-        dept_code = register_no[2:5]
-        batch_year = register_no[:2]
-        
-        if dept_code in department_codes:
-            dept_name = department_codes[dept_code]
-            row_values = [cell.value for cell in sheet[row]]
-            
-            if dept_name not in batch_workbooks:
-                batch_workbooks[dept_name] = {}
-                
-            if batch_year not in batch_workbooks[dept_name]:
-                new_wb = openpyxl.Workbook()
-                new_wb.active.append(headers)
-                batch_workbooks[dept_name][batch_year] = new_wb
-                
-            batch_workbooks[dept_name][batch_year].active.append(row_values)
-    
-    # Create ZIP file with all workbooks
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for dept, batches in batch_workbooks.items():
-            for batch_year, wb in batches.items():
-                batch_file = f'{dept.replace(" ", "_")}_Batch_{batch_year}.xlsx'
-                wb.save(batch_file)
-                zip_file.write(batch_file, batch_file)
-                import os
-                os.remove(batch_file)
-    
-    zip_buffer.seek(0)
-    return zip_buffer
-
-def main():
-    st.title("Marksheet Processing and Department-wise Excel Export")
-    
-    # Allow both Excel and CSV files
-    uploaded_file = st.file_uploader("Upload a Marksheet file", type=["xlsx", "csv"])
-    
-    if uploaded_file is not None:
-        try:
-            # Determine file type and read accordingly
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            
-            if file_extension == 'xlsx':
-                df = pd.read_excel(uploaded_file, header=None)
-            elif file_extension == 'csv':
-                df = pd.read_csv(uploaded_file, header=None)
-            else:
-                st.error("Unsupported file format. Please upload an .xlsx or .csv file.")
-                return
-            
-            # Process the file
-            processed_workbook = process_excel_file(df)
-            
-            # Create department/batch-wise files
-            zip_buffer = create_department_batches(processed_workbook)
-            
-            # Provide download button
-            st.download_button(
-                label="Download Department and Batch-wise Excel Files (ZIP)",
-                data=zip_buffer,
-                file_name="department_batch_excel_files.zip",
-                mime="application/zip"
-            )
-            
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-
-if __name__ == "__main__":
-    main()
+from __future__ import annotations
+
+import zipfile
+import io
+import os
+import shutil
+import sys
+import time
+import json
+import datetime
+import hashlib
+import functools
+import importlib.util
+import itertools
+import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple, Optional
+
+# pandas, numpy, openpyxl and streamlit take most of a second to import, so
+# each function imports what it uses; the CLI, the API and worker processes
+# only pay for the libraries their code paths need
+if TYPE_CHECKING:
+    import numpy as np
+    import openpyxl
+    import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Timestamp stamped on every generated workbook and ZIP entry, so the same
+# marksheet always produces a byte-for-byte identical archive
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Department registry and register number layout; MARKS_SPLITTING_REGISTRY
+# can point to another JSON, YAML or CSV file
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     'departments.json')
+
+# Bump whenever a change alters the generated archive, so results cached
+# by an older version are not served again
+CONFIG_VERSION = '4'
+
+# Compression methods for the department/batch archive. XLSX files are
+# already deflate-compressed, so storing them is the default: recompressing
+# costs CPU for almost no size gain
+ZIP_COMPRESSION = {
+    'store': zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+if hasattr(zipfile, 'ZIP_ZSTANDARD'):  # Python 3.14+
+    ZIP_COMPRESSION['zstd'] = zipfile.ZIP_ZSTANDARD
+DEFAULT_COMPRESSION = 'store'
+
+class PipelineMetrics:
+    """
+    Wall time, CPU time, row counts and peak RSS for each pipeline stage.
+    Stages run inside a `with PipelineMetrics() as metrics:` block are
+    recorded; a stage that runs several times (e.g. once per batch) is
+    accumulated into one entry.
+    """
+    
+    def __init__(self):
+        self.stages = {}
+        self._token = None
+    
+    def __enter__(self) -> 'PipelineMetrics':
+        self._token = _active_metrics.set(self)
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        _active_metrics.reset(self._token)
+    
+    def add(self, name: str, wall_seconds: float, cpu_seconds: float,
+            rows: Optional[int] = None) -> None:
+        """Record one run of a stage."""
+        stage = self.stages.setdefault(name, {
+            'stage': name, 'calls': 0, 'rows': None,
+            'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_bytes': None})
+        stage['calls'] += 1
+        stage['wall_seconds'] += wall_seconds
+        stage['cpu_seconds'] += cpu_seconds
+        if rows is not None:
+            stage['rows'] = (stage['rows'] or 0) + rows
+        stage['peak_rss_bytes'] = _peak_rss_bytes()
+    
+    def as_dict(self) -> dict:
+        """Stages in the order they first ran, plus the total wall time."""
+        stages = [dict(stage, wall_seconds=round(stage['wall_seconds'], 6),
+                       cpu_seconds=round(stage['cpu_seconds'], 6))
+                  for stage in self.stages.values()]
+        total = sum(stage['wall_seconds'] for stage in self.stages.values())
+        return {'stages': stages, 'total_wall_seconds': round(total, 6)}
+    
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.as_dict(), **kwargs)
+
+_active_metrics = ContextVar('_active_metrics', default=None)
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+@contextmanager
+def pipeline_stage(name: str, rows: Optional[int] = None):
+    """
+    Time a pipeline stage into the active PipelineMetrics, if there is one.
+    Works as a context manager or a decorator; the yielded dict's 'rows'
+    entry can be set inside the block once the row count is known.
+    """
+    stage = {'rows': rows}
+    metrics = _active_metrics.get()
+    if metrics is None:
+        yield stage
+        return
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield stage
+    finally:
+        metrics.add(name, time.perf_counter() - wall_start,
+                    time.process_time() - cpu_start, stage['rows'])
+
+def process_marks(marks: str) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    Process marks string and return internal, external, and total marks.
+    Handles both formats: '040+043' and '040'
+    
+    Args:
+        marks: String containing marks in either 'internal+external' or single total format
+        
+    Returns:
+        Tuple of (internal, external, total) marks, or (None, None, None) if invalid
+    """
+    if not marks:
+        return None, None, None
+        
+    if isinstance(marks, (int, float)):
+        total = int(marks)
+        return None, None, total
+    
+    marks_str = str(marks).strip()
+    
+    try:
+        if '+' in marks_str:
+            internal, external = marks_str.split('+')
+            internal_val = int(internal.lstrip('0') or '0')
+            external_val = int(external.lstrip('0') or '0')
+            return internal_val, external_val, internal_val + external_val
+        else:
+            total = int(marks_str.lstrip('0') or '0')
+            return None, None, total
+            
+    except (ValueError, TypeError):
+        return None, None, None
+
+def _process_marks_int64(marks) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    process_marks for values stored in 64-bit integer columns. Marks too
+    large to fit (19 or more digits, or infinite) are treated as invalid.
+    """
+    try:
+        parsed = process_marks(marks)
+    except OverflowError:
+        return None, None, None
+    if any(v is not None and not -2**63 <= v < 2**63 for v in parsed):
+        return None, None, None
+    return parsed
+
+def split_marks_series(marks: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized equivalent of process_marks for a whole Marks column.
+    The column is factorized first, so each distinct value is parsed once
+    and the results are broadcast back to every row.
+    
+    Args:
+        marks: Series holding the raw values of one Marks column
+        
+    Returns:
+        DataFrame with nullable integer columns internal, external and total
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(marks.to_numpy(dtype=object))
+    values, mask = _marks_cache.parse(uniques)
+    return pd.DataFrame({col: pd.arrays.IntegerArray(values[:, i], mask[:, i]).take(
+                             codes, allow_fill=True)
+                         for i, col in enumerate(['internal', 'external', 'total'])},
+                        index=marks.index)
+
+class MarksCache:
+    """
+    Bounded LRU of parsed Marks values shared by every split_marks_series
+    call in the process. Marks repeat heavily across subjects, files and
+    CSV chunks (there are only ~100x100 'III+EEE' strings), so after the
+    first column most distinct values are already parsed. hits and misses
+    count distinct values looked up.
+    
+    Args:
+        maxsize: Number of distinct values kept
+    """
+    
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def parse(self, uniques: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parse distinct Marks values, reusing cached results.
+        
+        Args:
+            uniques: Distinct, non-missing raw Marks values
+            
+        Returns:
+            Tuple of (values, mask) arrays with one (internal, external,
+            total) row per value; mask is True where the mark is blank
+        """
+        import pandas as pd
+        import numpy as np
+        with self._lock:
+            rows = [self._entries.get(value) for value in uniques]
+            missing = [i for i, row in enumerate(rows) if row is None]
+            self.hits += len(rows) - len(missing)
+            self.misses += len(missing)
+            for value, row in zip(uniques, rows):
+                if row is not None:
+                    self._entries.move_to_end(value)
+        
+        if missing:
+            parsed = _parse_unique_marks(pd.Series(uniques[missing], dtype=object))
+            new_rows = np.hstack([parsed.to_numpy(dtype='int64', na_value=0),
+                                  parsed.isna().to_numpy(dtype='int64')]).tolist()
+            with self._lock:
+                for i, row in zip(missing, new_rows):
+                    rows[i] = self._entries[uniques[i]] = tuple(row)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        
+        table = np.array(rows, dtype='int64').reshape(-1, 6)
+        return table[:, :3], table[:, 3:].astype(bool)
+    
+    def info(self) -> dict:
+        """Hit/miss counts and the current and maximum number of entries."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+    
+    def clear(self) -> None:
+        """Drop every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+_marks_cache = MarksCache()
+
+def marks_cache_info() -> dict:
+    """Statistics of the process-wide cache used by split_marks_series."""
+    return _marks_cache.info()
+
+def marks_cache_clear() -> None:
+    """Empty the process-wide Marks cache, e.g. before a cold benchmark run."""
+    _marks_cache.clear()
+
+def _parse_unique_marks(values: pd.Series) -> pd.DataFrame:
+    """
+    Parse distinct Marks values into internal/external/total.
+    Canonical values ('040+043', '040', numbers, blanks) are parsed with
+    pandas string ops; anything unusual falls back to process_marks so the
+    results are identical.
+    """
+    import pandas as pd
+    import numpy as np
+    result = pd.DataFrame(pd.NA, index=values.index,
+                          columns=['internal', 'external', 'total'], dtype='Int64')
+    
+    is_text = values.apply(isinstance, args=(str,)).astype(bool)
+    is_number = values.apply(isinstance, args=((int, float, np.number),)).astype(bool)
+    is_number &= ~is_text
+    
+    # Numbers: 0 and NaN count as blank, everything else is truncated to int
+    numbers = pd.to_numeric(values[is_number], errors='coerce').astype(float)
+    numbers = numbers[np.isfinite(numbers) & (numbers != 0) & (numbers.abs() < 2.0**63)]
+    result.loc[numbers.index, 'total'] = np.trunc(numbers).astype('int64')
+    
+    # Strings: '' is blank, otherwise strip and match the two known layouts
+    text = values[is_text]
+    text = text[text != ''].str.strip()
+    pair = text.str.extract(r'^([0-9]{0,9})\+([0-9]{0,9})$')
+    is_pair = pair[0].notna()
+    internal = pd.to_numeric(pair.loc[is_pair, 0].replace('', '0')).astype('int64')
+    external = pd.to_numeric(pair.loc[is_pair, 1].replace('', '0')).astype('int64')
+    result.loc[internal.index, 'internal'] = internal
+    result.loc[external.index, 'external'] = external
+    result.loc[internal.index, 'total'] = internal + external
+    
+    is_single = ~is_pair & text.str.fullmatch(r'[0-9]{0,18}').astype(bool)
+    single = pd.to_numeric(text[is_single].replace('', '0')).astype('int64')
+    result.loc[single.index, 'total'] = single
+    
+    # Whatever is left and could still parse goes through process_marks
+    leftover = text[~is_pair & ~is_single]
+    leftover = leftover[leftover.str.contains(r'\d', regex=True)]
+    others = values[~is_text & ~is_number & values.notna()]
+    for idx, value in pd.concat([leftover, others]).items():
+        result.loc[idx] = [pd.NA if v is None else v for v in _process_marks_int64(value)]
+    
+    return result
+
+def plan_column_layout(num_subjects: int, extra_cols: int = 0) -> List[str]:
+    """
+    Work out the final column order of the processed marksheet.
+    
+    Args:
+        num_subjects: Number of subjects in the marksheet
+        extra_cols: Number of trailing unnamed columns
+        
+    Returns:
+        Column names in output order: Register No, Name, College ID, then
+        Code, Name, Marks, Internal, External, Total, Result per subject
+    """
+    layout = ['Register No', 'Name', 'College ID']
+    for i in range(1, num_subjects + 1):
+        layout.extend([f'Subject Code {i}', f'Subject Name {i}', f'Marks {i}',
+                       f'Internal {i}', f'External {i}', f'Total {i}',
+                       f'Result {i}'])
+    layout.extend([f'Unnamed: {i}' for i in range(extra_cols)])
+    return layout
+
+def process_excel_file(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Process the uploaded file (Excel or CSV) and add internal/external/total columns.
+    
+    Args:
+        df: Input DataFrame with marksheet data
+        
+    Returns:
+        Processed DataFrame with Internal/External/Total columns after each Marks column
+    """
+    import pandas as pd
+    with pipeline_stage('header assignment', rows=len(df)):
+        # Calculate the number of subjects based on the remaining columns after the first 3
+        total_columns = len(df.columns)
+        num_subjects = (total_columns - 3) // 4  # Assuming 4 columns per subject (Code, Name, Marks, Result)
+        
+        # Generate headers dynamically
+        headers = ['Register No', 'Name', 'College ID']
+        for i in range(1, num_subjects + 1):
+            headers.extend([f'Subject Code {i}', f'Subject Name {i}', 
+                            f'Marks {i}', f'Result {i}'])
+        
+        # If there are extra columns, add them as unnamed columns
+        extra_cols = total_columns - len(headers)
+        if extra_cols > 0:
+            headers.extend([f'Unnamed: {i}' for i in range(extra_cols)])
+        
+        # Assign headers to DataFrame
+        df.columns = headers
+    
+    # Split marks for every subject, then build the output in a single pass
+    with pipeline_stage('marks split', rows=len(df)):
+        split_columns = {}
+        for subject_num in range(1, num_subjects + 1):
+            split = split_marks_series(df[f'Marks {subject_num}'])
+            for col_name in ['Internal', 'External', 'Total']:
+                split_columns[f'{col_name} {subject_num}'] = split[col_name.lower()].array
+    
+    with pipeline_stage('layout', rows=len(df)):
+        layout = plan_column_layout(num_subjects, max(extra_cols, 0))
+        new_columns = pd.DataFrame(split_columns, index=df.index)
+        processed_df = pd.concat([df, new_columns], axis=1)[layout]
+    
+    with pipeline_stage('compact dtypes', rows=len(df)):
+        return _compact_dtypes(processed_df, num_subjects)
+
+def _smallest_int_dtype(values: pd.Series) -> str:
+    """Smallest nullable integer dtype that holds every value in the series."""
+    import numpy as np
+    if values.isna().all():
+        return 'UInt8'
+    low, high = int(values.min()), int(values.max())
+    for dtype in ('UInt8', 'UInt16', 'UInt32') if low >= 0 else ('Int8', 'Int16', 'Int32'):
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return 'Int64'
+
+def _compact_dtypes(df: pd.DataFrame, num_subjects: int) -> pd.DataFrame:
+    """
+    Store the processed marksheet in compact dtypes: repeated text (college,
+    subject codes and names, raw marks, results) as categoricals and the split
+    marks as the smallest nullable integer type that fits. Values, and so the
+    exported workbooks, are unchanged.
+    """
+    dtypes = {'College ID': 'category'}
+    for i in range(1, num_subjects + 1):
+        for col_name in ['Subject Code', 'Subject Name', 'Marks', 'Result']:
+            dtypes[f'{col_name} {i}'] = 'category'
+        for col_name in ['Internal', 'External', 'Total']:
+            dtypes[f'{col_name} {i}'] = _smallest_int_dtype(df[f'{col_name} {i}'])
+    return df.astype(dtypes)
+
+def _export_rows(df: pd.DataFrame, chunk_size: int = 10000) -> Iterator[list]:
+    """
+    Yield DataFrame rows as plain Python lists for writing to a worksheet.
+    Missing values (NaN/NA) become None so they are written as empty cells.
+    Rows are converted chunk by chunk so only one chunk is copied at a time.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        values = chunk.astype(object).where(chunk.notna(), None)
+        yield from values.values.tolist()
+
+def compute_column_widths(df: pd.DataFrame,
+                          sample_rows: Optional[int] = None) -> List[int]:
+    """
+    Compute Excel column widths from the longest value in each column.
+    
+    Args:
+        df: Processed DataFrame containing all marks
+        sample_rows: Only look at the header and the first sample_rows rows,
+            which bounds the cost on very large files
+        
+    Returns:
+        Width of each column, in column order
+    """
+    sample = df if sample_rows is None else df.iloc[:sample_rows]
+    return [max(len(str(header)), _longest_value(sample.iloc[:, position])) + 2
+            for position, header in enumerate(df.columns)]
+
+def _longest_value(column: pd.Series) -> int:
+    """Length of the longest value of a column as text, 0 if it is empty."""
+    import pandas as pd
+    # Marks, codes and results repeat a lot, so only measure distinct values
+    lengths = pd.Series(column.dropna().unique()).astype(str).str.len()
+    return int(lengths.max()) if len(lengths) else 0
+
+def _new_batch_workbook(headers: List[str],
+                        widths: Optional[List[int]] = None) -> openpyxl.Workbook:
+    """
+    Create a write-only workbook for one department/batch with its header row.
+    Write-only worksheets stream appended rows out instead of keeping cell
+    objects in memory, so memory stays flat however many rows are added.
+    """
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for column, width in enumerate(widths or [], start=1):
+        sheet.column_dimensions[get_column_letter(column)].width = width
+    sheet.append(headers)
+    return workbook
+
+class RegisterNumberDecoder:
+    """
+    Decodes register numbers into department name and batch year.
+    The department code and batch year are fixed-width slices of the
+    register number (by default characters 3-5 and 1-2), so new programmes
+    or other numbering schemes only need a registry change.
+    
+    Args:
+        departments: Mapping of department code to department name
+        dept_start: Offset of the department code in the register number
+        dept_length: Length of the department code
+        batch_start: Offset of the batch year in the register number
+        batch_length: Length of the batch year
+    """
+    
+    def __init__(self, departments: Dict[str, str], dept_start: int = 2,
+                 dept_length: int = 3, batch_start: int = 0, batch_length: int = 2):
+        self.departments = dict(departments)
+        self.dept_start = dept_start
+        self.dept_length = dept_length
+        self.batch_start = batch_start
+        self.batch_length = batch_length
+    
+    @classmethod
+    def from_file(cls, path: str) -> 'RegisterNumberDecoder':
+        """
+        Load a registry from JSON, YAML or CSV.
+        JSON/YAML files hold a 'departments' mapping plus optional 'department'
+        and 'batch' sections with 'start' and 'length'. CSV files hold
+        'code,name' rows and use the default layout.
+        """
+        import pandas as pd
+        extension = path.rsplit('.', 1)[-1].lower()
+        if extension == 'csv':
+            registry = pd.read_csv(path, dtype=str, keep_default_na=False)
+            return cls(dict(zip(registry['code'], registry['name'])))
+        
+        with open(path, encoding='utf-8') as f:
+            if extension in ('yaml', 'yml'):
+                import yaml  # Optional dependency, only needed for YAML registries
+                config = yaml.safe_load(f)
+            elif extension == 'json':
+                config = json.load(f)
+            else:
+                raise ValueError(f"Unsupported registry format: .{extension}")
+        
+        dept = config.get('department', {})
+        batch = config.get('batch', {})
+        return cls({str(code): name for code, name in config['departments'].items()},
+                   dept_start=dept.get('start', 2), dept_length=dept.get('length', 3),
+                   batch_start=batch.get('start', 0), batch_length=batch.get('length', 2))
+    
+    def fingerprint(self) -> str:
+        """Short hash of the registry and layout, for cache keys."""
+        config = [sorted(self.departments.items()), self.dept_start,
+                  self.dept_length, self.batch_start, self.batch_length]
+        return hashlib.sha256(json.dumps(config).encode('utf-8')).hexdigest()[:16]
+    
+    def decode(self, register_no: pd.Series) -> pd.DataFrame:
+        """
+        Decode a whole column of register numbers at once.
+        
+        Args:
+            register_no: Series of register numbers
+            
+        Returns:
+            DataFrame with categorical 'dept' (department name) and 'batch'
+            (batch year) columns; both are missing for register numbers that
+            are not strings or whose department code is unknown
+        """
+        import pandas as pd
+        values = register_no.astype(object)
+        text = values[values.apply(isinstance, args=(str,)).astype(bool)]
+        dept_end = self.dept_start + self.dept_length
+        batch_end = self.batch_start + self.batch_length
+        
+        dept = text.str[self.dept_start:dept_end].map(self.departments)
+        batch = text.str[self.batch_start:batch_end].where(dept.notna())
+        return pd.DataFrame({
+            'dept': pd.Categorical(dept.reindex(values.index),
+                                   categories=list(dict.fromkeys(self.departments.values()))),
+            'batch': pd.Categorical(batch.reindex(values.index)),
+        }, index=register_no.index)
+
+@functools.lru_cache(maxsize=None)
+def load_register_decoder(path: Optional[str] = None) -> RegisterNumberDecoder:
+    """
+    Load a department registry once and reuse it for every later call.
+    Defaults to $MARKS_SPLITTING_REGISTRY, then departments.json next to this file.
+    """
+    return RegisterNumberDecoder.from_file(
+        path or os.environ.get('MARKS_SPLITTING_REGISTRY') or DEFAULT_REGISTRY_PATH)
+
+def partition_batches(df: pd.DataFrame,
+                      decoder: RegisterNumberDecoder) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Split the processed marksheet into department/batch partitions.
+    Department and batch year are decoded from the whole 'Register No'
+    column at once and grouped in a single groupby. Rows whose register
+    number is not a string, or whose department code is unknown, are skipped.
+    
+    Args:
+        df: Processed DataFrame containing all marks
+        decoder: Register number decoder with the department registry
+        
+    Returns:
+        Nested dict of department name -> batch year -> row positions in df,
+        in order of first appearance
+    """
+    keys = decoder.decode(df['Register No']).reset_index(drop=True)
+    groups = keys.groupby(['dept', 'batch'], sort=False, observed=True).indices
+    
+    # Departments in order of first appearance, then batches within each one
+    partitions = {}
+    for (dept_name, batch_year), positions in sorted(groups.items(), key=lambda g: g[1][0]):
+        partitions.setdefault(dept_name, {})[batch_year] = positions
+    return partitions
+
+class _FixedTimeZipFile(zipfile.ZipFile):
+    """
+    ZipFile that stamps every entry with FIXED_DATE_TIME instead of the
+    current time, so identical content always gives identical bytes.
+    """
+    
+    def writestr(self, zinfo_or_arcname, data, *args, **kwargs):
+        if not isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            zinfo_or_arcname = self._fixed_info(zinfo_or_arcname)
+        super().writestr(zinfo_or_arcname, data, *args, **kwargs)
+    
+    def write(self, filename, arcname=None, *args, **kwargs):
+        with open(filename, 'rb') as src, \
+                self.open(self._fixed_info(arcname or filename), 'w') as dst:
+            shutil.copyfileobj(src, dst)
+    
+    def _fixed_info(self, arcname: str) -> zipfile.ZipInfo:
+        zinfo = zipfile.ZipInfo(arcname, date_time=FIXED_DATE_TIME)
+        zinfo.compress_type = self.compression
+        zinfo._compresslevel = self.compresslevel  # As ZipFile.writestr does for names
+        zinfo.external_attr = 0o600 << 16
+        return zinfo
+
+def _save_workbook(wb: openpyxl.Workbook, stream) -> None:
+    """
+    Save a workbook to a file-like object with fixed timestamps, both in the
+    document properties and in the XLSX container itself.
+    """
+    from openpyxl.writer.excel import ExcelWriter
+    wb.properties.created = wb.properties.modified = datetime.datetime(*FIXED_DATE_TIME)
+    archive = _FixedTimeZipFile(stream, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+    ExcelWriter(wb, archive).save()
+
+def _workbook_bytes(wb: openpyxl.Workbook) -> bytes:
+    """Serialize a workbook to XLSX bytes."""
+    buffer = io.BytesIO()
+    _save_workbook(wb, buffer)
+    return buffer.getvalue()
+
+class _OpenpyxlBatchWriter:
+    """Batch workbook built with an openpyxl write-only workbook."""
+    
+    def __init__(self, headers: List[str], widths: Optional[List[int]] = None):
+        self._workbook = _new_batch_workbook(headers, widths)
+        self._sheet = self._workbook.worksheets[0]
+    
+    def append(self, row) -> None:
+        self._sheet.append(row)
+    
+    def getvalue(self) -> bytes:
+        return _workbook_bytes(self._workbook)
+
+class _XlsxwriterBatchWriter:
+    """
+    Batch workbook built with xlsxwriter in constant_memory mode, which
+    writes each row out to a temporary file as soon as it is appended.
+    """
+    
+    def __init__(self, headers: List[str], widths: Optional[List[int]] = None):
+        import xlsxwriter
+        self._buffer = io.BytesIO()
+        # Strings are written as-is, like openpyxl, instead of as hyperlinks,
+        # and dates get openpyxl's number format rather than none at all
+        self._workbook = xlsxwriter.Workbook(self._buffer, {
+            'constant_memory': True, 'strings_to_urls': False,
+            'default_date_format': 'yyyy-mm-dd h:mm:ss'})
+        self._workbook.set_properties({'created': datetime.datetime(*FIXED_DATE_TIME)})
+        self._sheet = self._workbook.add_worksheet('Sheet')
+        # Given in pixels (7 per character) so the stored width matches
+        # openpyxl's; set_column would add xlsxwriter's own padding
+        for column, width in enumerate(widths or []):
+            self._sheet.set_column_pixels(column, column, round(width * 7))
+        self._sheet.write_row(0, 0, headers)
+        self._next_row = 1
+    
+    def append(self, row) -> None:
+        self._sheet.write_row(self._next_row, 0, row)
+        self._next_row += 1
+    
+    def getvalue(self) -> bytes:
+        self._workbook.close()
+        return self._buffer.getvalue()
+
+# XLSX writers for the batch workbooks in order of preference; the first
+# one whose module is installed is used unless a writer is asked for
+XLSX_WRITERS = {
+    'xlsxwriter': ('xlsxwriter', _XlsxwriterBatchWriter),
+    'openpyxl': ('openpyxl', _OpenpyxlBatchWriter),
+}
+
+def available_xlsx_writer() -> str:
+    """Name of the fastest installed XLSX writer."""
+    for writer, (module, _) in XLSX_WRITERS.items():
+        if importlib.util.find_spec(module) is not None:
+            return writer
+    raise ImportError("No XLSX writer available; install openpyxl or xlsxwriter")
+
+def _batch_writer(headers: List[str], widths: Optional[List[int]] = None,
+                  writer: Optional[str] = None):
+    """Start a batch workbook with its header row using the given XLSX writer."""
+    writer = writer or available_xlsx_writer()
+    if writer not in XLSX_WRITERS:
+        raise ValueError(f"Unknown XLSX writer: {writer}")
+    _, writer_class = XLSX_WRITERS[writer]
+    return writer_class(headers, widths)
+
+def _batch_file_name(dept: str, batch_year: str, output_format: str = 'xlsx') -> str:
+    return f'{dept.replace(" ", "_")}_Batch_{batch_year}.{output_format}'
+
+# Formats each department/batch can be written in; parquet and feather
+# need pyarrow, and are much faster to write and to load back than XLSX
+OUTPUT_FORMATS = ('xlsx', 'parquet', 'feather')
+DEFAULT_FORMATS = ('xlsx',)
+
+def _check_output_formats(formats: Tuple[str, ...]) -> None:
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown output format: {', '.join(unknown) or 'none given'}; "
+                         f"choose from {', '.join(OUTPUT_FORMATS)}")
+    if set(formats) - {'xlsx'} and importlib.util.find_spec('pyarrow') is None:
+        raise ImportError("Parquet and Feather output need pyarrow; install it with "
+                          "'pip install pyarrow'")
+
+def _arrow_frame(batch: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column types for Parquet/Feather output: integer columns (the split
+    Internal/External/Total marks) keep their nullable integer type and
+    every other column becomes text, since raw columns can mix numbers and
+    strings and every batch file should share one schema.
+    """
+    import pandas as pd
+    text_columns = [col for col in batch.columns
+                    if not pd.api.types.is_integer_dtype(batch[col])]
+    return batch.astype(dict.fromkeys(text_columns, 'string')).reset_index(drop=True)
+
+def _serialize_batch(headers: List[str], batch: pd.DataFrame,
+                     widths: Optional[List[int]] = None,
+                     output_format: str = 'xlsx', writer: Optional[str] = None) -> bytes:
+    """
+    Serialize one department/batch partition to XLSX, Parquet or Feather bytes.
+    Module-level so it can be sent to a process pool.
+    """
+    if output_format != 'xlsx':
+        buffer = io.BytesIO()
+        if output_format == 'parquet':
+            _arrow_frame(batch).to_parquet(buffer, index=False)
+        else:
+            _arrow_frame(batch).to_feather(buffer)
+        return buffer.getvalue()
+    
+    batch_writer = _batch_writer(headers, widths, writer)
+    for row_values in _export_rows(batch):
+        batch_writer.append(row_values)
+    return batch_writer.getvalue()
+
+def _serialize_batches(df: pd.DataFrame, partitions: Dict[str, Dict[str, np.ndarray]],
+                       widths: Optional[List[int]] = None, workers: Optional[int] = 1,
+                       use_threads: bool = False,
+                       formats: Tuple[str, ...] = DEFAULT_FORMATS,
+                       writer: Optional[str] = None,
+                       only: Optional[set] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Serialize every partition, yielding (file name, bytes) in partition order,
+    one file per output format, or only the files named in `only`. With more
+    than one worker the files are built in a process pool (or a thread pool if
+    use_threads is set). Only a bounded number of partitions are in flight at
+    once, and results are yielded in submission order, so the output does not
+    depend on which worker finishes first.
+    """
+    headers = list(df.columns)
+    jobs = ((batch_file, positions, output_format)
+            for dept, batches in partitions.items()
+            for batch_year, positions in batches.items()
+            for output_format in formats
+            for batch_file in [_batch_file_name(dept, batch_year, output_format)]
+            if only is None or batch_file in only)
+    
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for batch_file, positions, output_format in jobs:
+            with pipeline_stage('serialize', rows=len(positions)):
+                data = _serialize_batch(headers, df.iloc[positions], widths,
+                                        output_format, writer)
+            yield batch_file, data
+        return
+    
+    def collect_oldest():
+        batch_file, rows, future = pending.popleft()
+        with pipeline_stage('serialize', rows=rows):
+            return batch_file, future.result()
+    
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        pending = deque()
+        for batch_file, positions, output_format in jobs:
+            future = executor.submit(_serialize_batch, headers, df.iloc[positions], widths,
+                                     output_format, writer)
+            pending.append((batch_file, len(positions), future))
+            if len(pending) >= workers * 2:
+                yield collect_oldest()
+        while pending:
+            yield collect_oldest()
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only, non-seekable stream that collects written bytes until they
+    are drained, so a ZipFile writing into it can be consumed piece by piece.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _iter_zip(entries: Iterator[Tuple[str, bytes]], compression: str = DEFAULT_COMPRESSION,
+              compresslevel: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Write (file name, bytes) entries into a ZIP archive, yielding the
+    compressed bytes of each entry as soon as it is written, then the
+    central directory. Only one entry is held in memory at a time.
+    """
+    if compression not in ZIP_COMPRESSION:
+        raise ValueError(f"Unknown compression: {compression}; "
+                         f"choose from {', '.join(ZIP_COMPRESSION)}")
+    sink = _ChunkSink()
+    with _FixedTimeZipFile(sink, 'w', ZIP_COMPRESSION[compression],
+                           compresslevel=compresslevel) as zip_file:
+        for batch_file, data in entries:
+            with pipeline_stage('zip'):
+                zip_file.writestr(batch_file, data)
+            yield sink.drain()
+    yield sink.drain()
+
+def iter_department_zip(df: pd.DataFrame, workers: Optional[int] = 1,
+                        use_threads: bool = False,
+                        width_sample_rows: Optional[int] = None,
+                        decoder: Optional[RegisterNumberDecoder] = None,
+                        compression: str = DEFAULT_COMPRESSION,
+                        compresslevel: Optional[int] = None,
+                        formats: Tuple[str, ...] = DEFAULT_FORMATS,
+                        writer: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream the department/batch ZIP archive as chunks of bytes.
+    Each batch workbook is serialized, compressed and yielded before the
+    next one is built, so the archive can go straight to a file or socket.
+    
+    Args:
+        df: Processed DataFrame containing all marks
+        workers: Number of workers serializing batch workbooks in parallel;
+            1 serializes in this process, None uses every CPU
+        use_threads: Use a thread pool instead of a process pool
+        width_sample_rows: Size column widths from only this many leading rows
+        decoder: Register number decoder; defaults to load_register_decoder()
+        compression: Archive compression, one of ZIP_COMPRESSION
+        compresslevel: Level for deflate (0-9) or bzip2 (1-9)
+        formats: Files written per department/batch, from OUTPUT_FORMATS
+        writer: XLSX writer from XLSX_WRITERS; defaults to the fastest installed
+        
+    Returns:
+        Iterator over the bytes of the ZIP archive
+    """
+    _check_output_formats(formats)
+    decoder = decoder or load_register_decoder()
+    widths = None
+    if 'xlsx' in formats:
+        with pipeline_stage('width sizing', rows=len(df)):
+            widths = compute_column_widths(df, width_sample_rows)
+    
+    with pipeline_stage('partition', rows=len(df)):
+        partitions = partition_batches(df, decoder)
+    
+    # Workbooks go into the archive in partition order, with fixed timestamps
+    yield from _iter_zip(_serialize_batches(df, partitions, widths, workers, use_threads,
+                                            formats, writer),
+                         compression, compresslevel)
+
+def create_department_batches(df: pd.DataFrame, workers: Optional[int] = 1,
+                              use_threads: bool = False,
+                              width_sample_rows: Optional[int] = None,
+                              decoder: Optional[RegisterNumberDecoder] = None,
+                              compression: str = DEFAULT_COMPRESSION,
+                              compresslevel: Optional[int] = None,
+                              formats: Tuple[str, ...] = DEFAULT_FORMATS,
+                              writer: Optional[str] = None) -> io.BytesIO:
+    """
+    Create batch-wise Excel (and/or Parquet/Feather) files for each department.
+    
+    Args:
+        df: Processed DataFrame containing all marks
+        workers: Number of workers serializing batch workbooks in parallel;
+            1 serializes in this process, None uses every CPU
+        use_threads: Use a thread pool instead of a process pool
+        width_sample_rows: Size column widths from only this many leading rows
+        decoder: Register number decoder; defaults to load_register_decoder()
+        compression: Archive compression, one of ZIP_COMPRESSION
+        compresslevel: Level for deflate (0-9) or bzip2 (1-9)
+        formats: Files written per department/batch, from OUTPUT_FORMATS
+        writer: XLSX writer from XLSX_WRITERS; defaults to the fastest installed
+        
+    Returns:
+        BytesIO object containing zipped department/batch files
+    """
+    return io.BytesIO(b''.join(iter_department_zip(df, workers, use_threads,
+                                                   width_sample_rows, decoder,
+                                                   compression, compresslevel, formats,
+                                                   writer)))
+
+def _batch_digests(df: pd.DataFrame, partitions: Dict[str, Dict[str, np.ndarray]],
+                   widths: Optional[List[int]], formats: Tuple[str, ...],
+                   writer: str) -> Dict[str, str]:
+    """
+    SHA-256 of everything that goes into each output file: its cell values
+    in order, headers, column widths, format and writer. Equal digests mean
+    the file would be rebuilt byte for byte. Files are in archive order.
+    """
+    import pandas as pd
+    digests = {}
+    for dept, batches in partitions.items():
+        for batch_year, positions in batches.items():
+            batch = df.iloc[positions]
+            rows = hashlib.sha256(pd.util.hash_pandas_object(batch, index=False).to_numpy())
+            for name, column in batch.items():
+                # 85 and '85' hash alike but are written as a number and as
+                # text, so columns mixing types in this batch also hash the
+                # type of each value. Categories are sheet-wide, so only the
+                # ones the batch uses count
+                values = (column.cat.remove_unused_categories().cat.categories
+                          if isinstance(column.dtype, pd.CategoricalDtype) else column)
+                if pd.api.types.infer_dtype(values, skipna=True).startswith('mixed'):
+                    types = column.map(lambda value: type(value).__name__)
+                    rows.update(pd.util.hash_pandas_object(types, index=False).to_numpy())
+            for output_format in formats:
+                digest = hashlib.sha256()
+                options = [CONFIG_VERSION, output_format, list(df.columns)]
+                if output_format == 'xlsx':
+                    options += [writer, widths]
+                digest.update(repr(options).encode('utf-8') + b'\0')
+                digest.update(rows.digest())
+                digests[_batch_file_name(dept, batch_year, output_format)] = digest.hexdigest()
+    return digests
+
+def _row_hashes(df: pd.DataFrame) -> Dict[str, str]:
+    """Hash of every row, keyed by Register No."""
+    import pandas as pd
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return {str(register_no): format(row_hash, '016x')
+            for register_no, row_hash in zip(df['Register No'], hashes)}
+
+def iter_department_zip_incremental(df: pd.DataFrame, previous_zip=None,
+                                    previous_snapshot: Optional[dict] = None,
+                                    workers: Optional[int] = 1,
+                                    use_threads: bool = False,
+                                    width_sample_rows: Optional[int] = None,
+                                    decoder: Optional[RegisterNumberDecoder] = None,
+                                    compression: str = DEFAULT_COMPRESSION,
+                                    compresslevel: Optional[int] = None,
+                                    formats: Tuple[str, ...] = DEFAULT_FORMATS,
+                                    writer: Optional[str] = None
+                                    ) -> Tuple[dict, Iterator[bytes]]:
+    """
+    Build the department/batch ZIP again after a revision, rebuilding only
+    the batch files whose rows changed since the previous run. Every other
+    file is copied from the previous archive as-is.
+    
+    Args:
+        df: Processed DataFrame containing all marks
+        previous_zip: Path or file-like object of the previous run's archive
+        previous_snapshot: Snapshot returned by the previous run; without it
+            (or without previous_zip) every file is built. Files whose CRC
+            or size in previous_zip differ from the snapshot are rebuilt too
+        workers, use_threads, width_sample_rows, decoder, compression,
+        compresslevel, formats, writer: As for iter_department_zip
+        
+    Returns:
+        Tuple of (snapshot of this run, iterator over the bytes of the ZIP
+        archive). The snapshot is JSON-serializable; keep it with the
+        archive for the next run, once the iterator is exhausted, since the
+        CRC and size of each file are filled in as it is written. Its
+        'changes' entry counts the rows changed, added and removed by
+        Register No and the files reused and rebuilt.
+    """
+    _check_output_formats(formats)
+    decoder = decoder or load_register_decoder()
+    writer = writer or available_xlsx_writer()
+    widths = None
+    if 'xlsx' in formats:
+        with pipeline_stage('width sizing', rows=len(df)):
+            widths = compute_column_widths(df, width_sample_rows)
+    
+    with pipeline_stage('partition', rows=len(df)):
+        partitions = partition_batches(df, decoder)
+    
+    with pipeline_stage('diff', rows=len(df)):
+        files = {name: {'digest': digest, 'crc': None, 'size': None}
+                 for name, digest in _batch_digests(df, partitions, widths, formats,
+                                                    writer).items()}
+        rows = _row_hashes(df)
+        previous = previous_snapshot if previous_zip is not None else None
+        previous_files, previous_rows = {}, {}
+        if previous and previous.get('version') == CONFIG_VERSION:
+            # Only trust entries the previous archive still holds as recorded;
+            # it may have been overwritten by a run that kept no snapshot
+            with zipfile.ZipFile(previous_zip) as old:
+                archived = {info.filename: (info.CRC, info.file_size) for info in old.infolist()}
+            previous_files = {name: entry['digest'] for name, entry in previous['files'].items()
+                              if archived.get(name) == (entry['crc'], entry['size'])}
+            previous_rows = previous['rows']
+        reused = {name for name, entry in files.items()
+                  if previous_files.get(name) == entry['digest']}
+        changes = {
+            'rows_changed': sum(1 for key, row_hash in rows.items()
+                                if key in previous_rows and previous_rows[key] != row_hash),
+            'rows_added': sum(1 for key in rows if key not in previous_rows),
+            'rows_removed': sum(1 for key in previous_rows if key not in rows),
+            'files_reused': len(reused),
+            'files_rebuilt': len(files) - len(reused),
+        }
+    snapshot = {'version': CONFIG_VERSION, 'files': files, 'rows': rows, 'changes': changes}
+    
+    def entries():
+        rebuilt = _serialize_batches(df, partitions, widths, workers, use_threads,
+                                     formats, writer, only=set(files) - reused)
+        with zipfile.ZipFile(previous_zip) if reused else nullcontext() as old:
+            for name, entry in files.items():
+                if name in reused:
+                    with pipeline_stage('reuse'):
+                        data = old.read(name)
+                else:
+                    name, data = next(rebuilt)
+                entry['crc'], entry['size'] = zlib.crc32(data), len(data)
+                yield name, data
+    
+    return snapshot, _iter_zip(entries(), compression, compresslevel)
+
+def iter_department_zip_from_csv(source, chunk_size: int = 50000,
+                                 decoder: Optional[RegisterNumberDecoder] = None,
+                                 compression: str = DEFAULT_COMPRESSION,
+                                 compresslevel: Optional[int] = None,
+                                 writer: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream the department/batch ZIP for a CSV marksheet read in chunks.
+    Each chunk is split and partitioned on its own and its rows are appended
+    to per-batch write-only workbooks, so memory does not grow with the size
+    of the file. Column widths are sized from the first chunk.
+    
+    Args:
+        source: Path or file-like object of a header-less CSV marksheet
+        chunk_size: Number of rows read and processed at a time
+        decoder: Register number decoder; defaults to load_register_decoder()
+        compression: Archive compression, one of ZIP_COMPRESSION
+        compresslevel: Level for deflate (0-9) or bzip2 (1-9)
+        writer: XLSX writer from XLSX_WRITERS; defaults to the fastest installed
+        
+    Returns:
+        Iterator over the bytes of the ZIP archive
+    """
+    decoder = decoder or load_register_decoder()
+    chunks = _read_marksheet_csv(source, chunk_size)
+    batch_writers = {}
+    widths = None
+    
+    while True:
+        with pipeline_stage('read') as stage:
+            chunk = next(chunks, None)
+            stage['rows'] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            break
+        
+        processed_df = process_excel_file(chunk)
+        if widths is None:
+            with pipeline_stage('width sizing', rows=len(processed_df)):
+                widths = compute_column_widths(processed_df)
+        
+        with pipeline_stage('partition', rows=len(processed_df)):
+            partitions = partition_batches(processed_df, decoder)
+        
+        # Departments and batches stay in order of first appearance in the file
+        for dept, batches in partitions.items():
+            dept_writers = batch_writers.setdefault(dept, {})
+            for batch_year, positions in batches.items():
+                if batch_year not in dept_writers:
+                    dept_writers[batch_year] = _batch_writer(
+                        list(processed_df.columns), widths, writer)
+                batch_writer = dept_writers[batch_year]
+                with pipeline_stage('serialize', rows=len(positions)):
+                    for row_values in _export_rows(processed_df.iloc[positions]):
+                        batch_writer.append(row_values)
+    
+    yield from _iter_zip(_saved_workbooks(batch_writers), compression, compresslevel)
+
+def _saved_workbooks(batch_writers: Dict[str, Dict[str, object]]
+                     ) -> Iterator[Tuple[str, bytes]]:
+    for dept, batches in batch_writers.items():
+        for batch_year, batch_writer in batches.items():
+            with pipeline_stage('serialize'):
+                data = batch_writer.getvalue()
+            yield _batch_file_name(dept, batch_year), data
+
+def create_department_batches_from_csv(source, chunk_size: int = 50000,
+                                       decoder: Optional[RegisterNumberDecoder] = None,
+                                       compression: str = DEFAULT_COMPRESSION,
+                                       compresslevel: Optional[int] = None,
+                                       writer: Optional[str] = None) -> io.BytesIO:
+    """
+    Create the department/batch ZIP from a CSV marksheet read in chunks.
+    See iter_department_zip_from_csv.
+    
+    Returns:
+        BytesIO object containing zipped department/batch files
+    """
+    return io.BytesIO(b''.join(iter_department_zip_from_csv(source, chunk_size, decoder,
+                                                            compression, compresslevel,
+                                                            writer)))
+
+# Cell types SQLite can't store, as (tag, store, restore): the value goes in
+# the raw column in a form SQLite keeps, and the tag in a column of its own
+_SQLITE_TAGGED_TYPES = {
+    bool: ('bool', int, bool),
+    datetime.datetime: ('datetime', datetime.datetime.isoformat,
+                        datetime.datetime.fromisoformat),
+    datetime.date: ('date', datetime.date.isoformat, datetime.date.fromisoformat),
+    datetime.time: ('time', datetime.time.isoformat, datetime.time.fromisoformat),
+    datetime.timedelta: ('timedelta', datetime.timedelta.total_seconds,
+                         lambda seconds: datetime.timedelta(seconds=seconds)),
+}
+_SQLITE_RESTORE = {tag: restore for tag, _, restore in _SQLITE_TAGGED_TYPES.values()}
+
+def _sqlite_row(row: list) -> Tuple[list, Dict[int, str]]:
+    """
+    A raw row in the form stored in SQLite, and the tag of each cell whose
+    type SQLite can't store (by column), so it can be restored on export.
+    """
+    if _SQLITE_TAGGED_TYPES.keys().isdisjoint(map(type, row)):
+        return row, {}
+    row, tags = list(row), {}
+    for column, value in enumerate(row):
+        if type(value) in _SQLITE_TAGGED_TYPES:
+            tags[column], store, _ = _SQLITE_TAGGED_TYPES[type(value)]
+            row[column] = store(value)
+    return row, tags
+
+@functools.lru_cache(maxsize=65536)
+def _marks_part(marks, part: int) -> Optional[int]:
+    """SQLite function marks_part(marks, part): one element of process_marks(marks)."""
+    return _process_marks_int64(marks)[part]
+
+def _marks_split_sql(marks: str) -> Tuple[str, str, str]:
+    """
+    SQL expressions for the internal, external and total marks of a raw
+    Marks column, matching process_marks. Canonical text ('040+043',
+    '085'), numbers and blanks are parsed in SQL; anything else goes
+    through the marks_part function.
+    """
+    is_text = f"typeof({marks}) = 'text'"
+    pair = (f"{is_text} AND {marks} GLOB '*+*' AND {marks} NOT GLOB '*+*+*' "
+            f"AND {marks} NOT GLOB '*[^0-9+]*' AND instr({marks}, '+') <= 10 "
+            f"AND length({marks}) - instr({marks}, '+') <= 9")
+    single = (f"{is_text} AND {marks} <> '' AND {marks} NOT GLOB '*[^0-9]*' "
+              f"AND length({marks}) <= 18")
+    number = f"typeof({marks}) IN ('integer', 'real')"
+    blank = f"{marks} IS NULL OR {marks} = ''"
+    internal = f"CAST(substr({marks}, 1, instr({marks}, '+') - 1) AS INTEGER)"
+    external = f"CAST(substr({marks}, instr({marks}, '+') + 1) AS INTEGER)"
+    not_split = f"{single} OR {number} OR {blank}"
+    return (
+        f"CASE WHEN {pair} THEN {internal} WHEN {not_split} THEN NULL "
+        f"ELSE marks_part({marks}, 0) END",
+        f"CASE WHEN {pair} THEN {external} WHEN {not_split} THEN NULL "
+        f"ELSE marks_part({marks}, 1) END",
+        # Numbers: 0 counts as blank, everything else is truncated to int
+        f"CASE WHEN {pair} THEN {internal} + {external} "
+        f"WHEN {single} THEN CAST({marks} AS INTEGER) "
+        f"WHEN {number} THEN CASE WHEN {marks} = 0 OR abs({marks}) >= 9e18 THEN NULL "
+        f"ELSE CAST({marks} AS INTEGER) END "
+        f"WHEN {blank} THEN NULL ELSE marks_part({marks}, 2) END",
+    )
+
+def _iter_raw_rows(source, file_extension: str, chunk_size: int) -> Iterator[List[list]]:
+    """
+    Read a header-less marksheet in lists of at most chunk_size rows, with
+    missing values as None. CSV chunks are read like
+    iter_department_zip_from_csv, with the Marks columns as text; Excel rows come from openpyxl read-only.
+    """
+    if file_extension == 'csv':
+        for chunk in _read_marksheet_csv(source, chunk_size):
+            yield list(_export_rows(chunk, chunk_size))
+    elif file_extension == 'xlsx':
+        import openpyxl
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            while True:
+                chunk = [list(row) for row in itertools.islice(rows, chunk_size)]
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file format: .{file_extension}")
+
+def iter_department_zip_sqlite(source, file_extension: str, db_path: Optional[str] = None,
+                               chunk_size: int = 50000,
+                               decoder: Optional[RegisterNumberDecoder] = None,
+                               compression: str = DEFAULT_COMPRESSION,
+                               compresslevel: Optional[int] = None,
+                               writer: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream the department/batch ZIP using an on-disk SQLite database instead
+    of pandas, for marksheets larger than memory. The file is loaded in
+    chunks, the marks are split with one UPDATE and the department/batch
+    partitions are found with a GROUP BY over an index on the register
+    number. Each partition is then read back with a cursor and appended to
+    a write-only workbook, so only one workbook is held at a time.
+    
+    Args:
+        source: Path or file-like object of a header-less marksheet
+        file_extension: 'xlsx' or 'csv'
+        db_path: Where to build the database; defaults to a temporary file
+            that is removed afterwards
+        chunk_size: Number of rows loaded and exported at a time
+        decoder: Register number decoder; defaults to load_register_decoder()
+        compression: Archive compression, one of ZIP_COMPRESSION
+        compresslevel: Level for deflate (0-9) or bzip2 (1-9)
+        writer: XLSX writer from XLSX_WRITERS; defaults to the fastest installed
+        
+    Returns:
+        Iterator over the bytes of the ZIP archive
+    """
+    decoder = decoder or load_register_decoder()
+    temp_path = None
+    if db_path is None:
+        fd, temp_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        db_path = temp_path
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA temp_store = FILE')
+        conn.create_function('marks_part', 2, _marks_part, deterministic=True)
+        
+        # Raw columns are untyped, so values keep the type they were read
+        # with; booleans, dates and times also get a tag column k<i>, added
+        # the first time column c<i> holds one
+        chunks = _iter_raw_rows(source, file_extension, chunk_size)
+        total_columns = total_rows = 0
+        tagged = []
+        while True:
+            with pipeline_stage('read') as stage:
+                rows = next(chunks, None)
+                stage['rows'] = 0 if rows is None else len(rows)
+                if rows and not total_columns:
+                    total_columns = len(rows[0])
+                    conn.execute('DROP TABLE IF EXISTS marks')
+                    conn.execute(f"CREATE TABLE marks "
+                                 f"({', '.join(f'c{i}' for i in range(total_columns))})")
+                if rows:
+                    rows = [_sqlite_row(row) for row in rows]
+                    for column in sorted({column for _, tags in rows for column in tags}):
+                        if column not in tagged:
+                            conn.execute(f'ALTER TABLE marks ADD COLUMN k{column}')
+                            tagged.append(column)
+                    columns = [f'c{i}' for i in range(total_columns)] + [f'k{i}' for i in tagged]
+                    conn.executemany(
+                        f"INSERT INTO marks ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})",
+                        [row + [tags.get(column) for column in tagged] if tagged else row
+                         for row, tags in rows])
+                    total_rows += len(rows)
+            if rows is None:
+                break
+        if file_extension == 'xlsx' and total_columns:
+            # openpyxl pads rows to the sheet's size, which includes formatted
+            # but empty cells; drop trailing columns without a value, as the
+            # pandas readers do
+            last_used = ' '.join(f'WHEN c{i} IS NOT NULL THEN {i + 1}'
+                                 for i in reversed(range(total_columns)))
+            total_columns = conn.execute(
+                f"SELECT max(CASE {last_used} ELSE 0 END) FROM marks").fetchone()[0] or 0
+        if not total_columns:
+            raise ValueError("The marksheet is empty")
+        
+        num_subjects = (total_columns - 3) // 4
+        extra_cols = max(total_columns - 3 - num_subjects * 4, 0)
+        with pipeline_stage('marks split', rows=total_rows):
+            assignments = []
+            for i in range(num_subjects):
+                for name, expression in zip('iet', _marks_split_sql(f'c{3 + i * 4 + 2}')):
+                    conn.execute(f'ALTER TABLE marks ADD COLUMN {name}{i}')
+                    assignments.append(f'{name}{i} = {expression}')
+            if assignments:
+                conn.execute(f"UPDATE marks SET {', '.join(assignments)}")
+        
+        # Output columns in plan_column_layout order
+        sources = ['c0', 'c1', 'c2']
+        for i in range(num_subjects):
+            raw = 3 + i * 4
+            sources.extend([f'c{raw}', f'c{raw + 1}', f'c{raw + 2}',
+                            f'i{i}', f'e{i}', f't{i}', f'c{raw + 3}'])
+        sources.extend(f'c{3 + num_subjects * 4 + i}' for i in range(extra_cols))
+        headers = plan_column_layout(num_subjects, extra_cols)
+        
+        with pipeline_stage('width sizing', rows=total_rows):
+            lengths = conn.execute(f"SELECT {', '.join(f'max(length({c}))' for c in sources)} "
+                                   f"FROM marks").fetchone()
+            widths = [max(len(header), length or 0) + 2
+                      for header, length in zip(headers, lengths)]
+            # Tagged columns are measured as the pandas backend would see
+            # them: restored, and categorical except for Register No, Name
+            # and extra columns
+            if tagged:
+                import pandas as pd
+            for column in tagged:
+                values = pd.Series([value if tag is None else _SQLITE_RESTORE[tag](value)
+                                    for value, tag in conn.execute(
+                                        f'SELECT DISTINCT c{column}, k{column} FROM marks')],
+                                   dtype=object)
+                if 2 <= column < 3 + num_subjects * 4:
+                    values = values.astype('category')
+                position = sources.index(f'c{column}')
+                widths[position] = max(len(headers[position]), _longest_value(values)) + 2
+        
+        with pipeline_stage('partition', rows=total_rows):
+            dept_code = f'substr(c0, {decoder.dept_start + 1}, {decoder.dept_length})'
+            batch_year = f'substr(c0, {decoder.batch_start + 1}, {decoder.batch_length})'
+            conn.execute('DROP TABLE IF EXISTS departments')
+            conn.execute('CREATE TABLE departments (code TEXT PRIMARY KEY, name TEXT)')
+            conn.executemany('INSERT INTO departments VALUES (?, ?)',
+                             decoder.departments.items())
+            conn.execute(f'CREATE INDEX marks_batch ON marks ({dept_code}, {batch_year})')
+            # Departments in order of first appearance, then batches within each one
+            partitions = {}
+            for dept_name, batch, _ in conn.execute(
+                    f"SELECT d.name, {batch_year}, min(m.rowid) AS first_row "
+                    f"FROM marks m JOIN departments d ON d.code = {dept_code} "
+                    f"WHERE typeof(c0) = 'text' GROUP BY d.name, {batch_year} "
+                    f"ORDER BY first_row"):
+                partitions.setdefault(dept_name, []).append(batch)
+        
+        # Exported rows end with the tag columns; each tagged value is restored
+        # to the type it was read with
+        restore = [(sources.index(f'c{column}'), len(sources) + i)
+                   for i, column in enumerate(tagged)]
+        
+        def restored(row: tuple) -> list:
+            values = list(row[:len(sources)])
+            for position, tag_position in restore:
+                tag = row[tag_position]
+                if tag is not None:
+                    values[position] = _SQLITE_RESTORE[tag](values[position])
+            return values
+        
+        def entries():
+            query = (f"SELECT {', '.join(sources + [f'k{column}' for column in tagged])} "
+                     f"FROM marks "
+                     f"WHERE typeof(c0) = 'text' AND {batch_year} = ? AND {dept_code} IN "
+                     f"(SELECT code FROM departments WHERE name = ?) ORDER BY rowid")
+            for dept_name, batches in partitions.items():
+                for batch in batches:
+                    with pipeline_stage('serialize') as stage:
+                        batch_writer = _batch_writer(headers, widths, writer)
+                        cursor = conn.execute(query, (batch, dept_name))
+                        stage['rows'] = 0
+                        while True:
+                            rows = cursor.fetchmany(chunk_size)
+                            if not rows:
+                                break
+                            for row in rows:
+                                batch_writer.append(restored(row) if restore else row)
+                            stage['rows'] += len(rows)
+                        data = batch_writer.getvalue()
+                    yield _batch_file_name(dept_name, batch), data
+        
+        yield from _iter_zip(entries(), compression, compresslevel)
+    finally:
+        conn.close()
+        if temp_path is not None:
+            os.remove(temp_path)
+
+def create_department_batches_sqlite(source, file_extension: str, db_path: Optional[str] = None,
+                                     chunk_size: int = 50000,
+                                     decoder: Optional[RegisterNumberDecoder] = None,
+                                     compression: str = DEFAULT_COMPRESSION,
+                                     compresslevel: Optional[int] = None,
+                                     writer: Optional[str] = None) -> io.BytesIO:
+    """
+    Create the department/batch ZIP through the SQLite backend.
+    See iter_department_zip_sqlite.
+    
+    Returns:
+        BytesIO object containing zipped department/batch files
+    """
+    return io.BytesIO(b''.join(iter_department_zip_sqlite(
+        source, file_extension, db_path, chunk_size, decoder, compression, compresslevel,
+        writer)))
+
+def _read_xlsx_calamine(source) -> pd.DataFrame:
+    """Read the first sheet with the Rust-based calamine engine."""
+    import pandas as pd
+    return pd.read_excel(source, header=None, engine='calamine', dtype=object)
+
+def _read_xlsx_openpyxl(source) -> pd.DataFrame:
+    """
+    Read the first sheet with openpyxl in read-only mode, taking plain cell
+    values instead of building cell objects.
+    """
+    import pandas as pd
+    import openpyxl
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = list(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+    
+    # Drop trailing empty rows and columns, like pd.read_excel does; cells
+    # that are formatted but empty still count towards the sheet's size
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    width = max((max((i + 1 for i, value in enumerate(row) if value is not None), default=0)
+                 for row in rows), default=0)
+    return pd.DataFrame([row[:width] for row in rows], dtype=object)
+
+# Excel readers in order of preference; the first one whose module is
+# installed is used unless an engine is asked for explicitly
+XLSX_READERS = {
+    'calamine': ('python_calamine', _read_xlsx_calamine),
+    'openpyxl': ('openpyxl', _read_xlsx_openpyxl),
+}
+
+def available_xlsx_engine() -> str:
+    """Name of the fastest installed Excel reader."""
+    for engine, (module, _) in XLSX_READERS.items():
+        if importlib.util.find_spec(module) is not None:
+            return engine
+    raise ImportError("No Excel reader available; install openpyxl or python-calamine")
+
+def _numeric_marks(marks: pd.Series) -> pd.Series:
+    """
+    Turn Marks read as text back into numbers where pd.read_csv would have
+    typed a column of them as numbers: '085' becomes 85 and '85.5' or '1e2'
+    floats, while 'internal+external' pairs and other text stay as they are.
+    Going value by value keeps the result the same however the file is
+    chunked.
+    """
+    import pandas as pd
+    text = marks.str.strip()
+    numbers = pd.to_numeric(text.mask(text.str.contains(r'(?<![eE])\+', na=False)),
+                            errors='coerce')
+    integers = text.str.fullmatch(r'-?[0-9]{1,18}', na=False)
+    values = marks.astype(object)
+    floats = numbers.notna() & ~integers
+    values[floats] = numbers[floats]
+    values[integers] = [int(value) for value in text[integers]]
+    return values
+
+def _read_marksheet_csv(source, chunk_size: Optional[int] = None):
+    """
+    pd.read_csv for a header-less marksheet, whole or in chunks of
+    chunk_size rows. The Marks columns are read as text and converted by
+    _numeric_marks, so a Marks value comes out the same whether or not
+    another row of the file, or of the same chunk, holds '040+043'. Other
+    columns are typed by pandas.
+    """
+    import pandas as pd
+    # The first line sets the number of columns, as it does for pandas
+    position = source.tell() if hasattr(source, 'seek') else None
+    total_columns = len(pd.read_csv(source, header=None, nrows=0).columns)
+    if position is not None:
+        source.seek(position)
+    marks_columns = [3 + i * 4 + 2 for i in range((total_columns - 3) // 4)]
+    
+    def convert(df):
+        for column in marks_columns:
+            df[column] = _numeric_marks(df[column])
+        return df
+    
+    reader = pd.read_csv(source, header=None, dtype=dict.fromkeys(marks_columns, str),
+                         chunksize=chunk_size)
+    if chunk_size is None:
+        return convert(reader)
+    return (convert(chunk) for chunk in reader)
+
+def read_marksheet(source, file_extension: str,
+                   engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read a header-less marksheet from a path or file-like object.
+    Excel values are kept as object dtype, so Marks such as '040' stay
+    strings and numeric columns with blanks are not turned into floats.
+    CSV Marks columns are read as text for the same reason.
+    
+    Args:
+        source: Path or binary file-like object
+        file_extension: 'xlsx' or 'csv'
+        engine: Excel reader from XLSX_READERS; defaults to the fastest installed
+        
+    Returns:
+        Raw DataFrame with integer column labels
+    """
+    with pipeline_stage('read') as stage:
+        if file_extension == 'xlsx':
+            engine = engine or available_xlsx_engine()
+            if engine not in XLSX_READERS:
+                raise ValueError(f"Unknown Excel engine: {engine}")
+            _, reader = XLSX_READERS[engine]
+            df = reader(source)
+        elif file_extension == 'csv':
+            df = _read_marksheet_csv(source)
+        else:
+            raise ValueError(f"Unsupported file format: .{file_extension}")
+        stage['rows'] = len(df)
+    return df
+
+def iter_marksheet_zip(data: bytes, file_extension: str,
+                       formats: Tuple[str, ...] = DEFAULT_FORMATS) -> Iterator[bytes]:
+    """
+    Run the whole pipeline on an uploaded file's bytes, streaming the result.
+    
+    Args:
+        data: Contents of an .xlsx or .csv marksheet
+        file_extension: 'xlsx' or 'csv'
+        formats: Files written per department/batch, from OUTPUT_FORMATS
+        
+    Returns:
+        Iterator over the bytes of the department/batch ZIP archive
+    """
+    df = read_marksheet(io.BytesIO(data), file_extension)
+    
+    # Process the file
+    processed_df = process_excel_file(df)
+    
+    # Create department/batch-wise files
+    return iter_department_zip(processed_df, formats=formats)
+
+def split_marksheet(data: bytes, file_extension: str,
+                    formats: Tuple[str, ...] = DEFAULT_FORMATS) -> bytes:
+    """Run the whole pipeline on an uploaded file's bytes and return the ZIP."""
+    return b''.join(iter_marksheet_zip(data, file_extension, formats))
+
+# How split_marksheets combines several uploads into one archive
+MERGE_PER_BATCH = 'per batch'
+MERGE_PER_FILE = 'per source file'
+MERGE_MODES = (MERGE_PER_BATCH, MERGE_PER_FILE)
+
+def merge_marksheets(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Stack processed marksheets from several files into one, so every
+    department/batch gets a single workbook across all the files. Files
+    with fewer subjects get empty columns for the subjects they lack.
+    
+    Args:
+        frames: Outputs of process_excel_file, in upload order
+        
+    Returns:
+        Processed DataFrame with the widest layout of all the files
+    """
+    import pandas as pd
+    num_subjects = max(sum(col.startswith('Marks ') for col in df.columns) for df in frames)
+    extra_cols = max(sum(col.startswith('Unnamed: ') for col in df.columns) for df in frames)
+    layout = plan_column_layout(num_subjects, extra_cols)
+    merged = pd.concat(frames, ignore_index=True).reindex(columns=layout)
+    return _compact_dtypes(merged, num_subjects)
+
+def _source_folders(names: List[str]) -> List[str]:
+    """Folder name for each uploaded file: its stem, numbered if repeated."""
+    folders = []
+    for name in names:
+        stem = folder = os.path.splitext(os.path.basename(name))[0]
+        count = 1
+        while folder in folders:
+            count += 1
+            folder = f'{stem}_{count}'
+        folders.append(folder)
+    return folders
+
+def iter_merged_zip(archives: List[Tuple[str, bytes]],
+                    compression: str = DEFAULT_COMPRESSION,
+                    compresslevel: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Repack several department/batch archives into one, with each archive's
+    workbooks in a folder of its own.
+    
+    Args:
+        archives: (folder name, ZIP bytes) pairs
+        compression: Archive compression, one of ZIP_COMPRESSION
+        compresslevel: Level for deflate (0-9) or bzip2 (1-9)
+        
+    Returns:
+        Iterator over the bytes of the merged ZIP archive
+    """
+    def entries():
+        for folder, archive in archives:
+            with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+                for name in zip_file.namelist():
+                    yield f'{folder}/{name}', zip_file.read(name)
+    
+    return _iter_zip(entries(), compression, compresslevel)
+
+def _process_upload(data: bytes, file_extension: str, merge: str,
+                    formats: Tuple[str, ...]):
+    """
+    Worker task for split_marksheets: the processed DataFrame when batches
+    are merged across files, otherwise the file's own ZIP. Also returns
+    the number of rows read.
+    """
+    with PipelineMetrics() as metrics:
+        if merge == MERGE_PER_BATCH:
+            result = process_excel_file(read_marksheet(io.BytesIO(data), file_extension))
+        else:
+            result = split_marksheet(data, file_extension, formats)
+    return result, metrics.stages['read']['rows']
+
+def split_marksheets(uploads: List[Tuple[str, bytes]], merge: str = MERGE_PER_BATCH,
+                     workers: Optional[int] = None, use_threads: bool = False,
+                     on_progress=None,
+                     formats: Tuple[str, ...] = DEFAULT_FORMATS) -> bytes:
+    """
+    Read and split several marksheets concurrently into one ZIP archive.
+    
+    Args:
+        uploads: (file name, file bytes) pairs of .xlsx/.csv marksheets
+        merge: MERGE_PER_BATCH to combine each department/batch across
+            files, MERGE_PER_FILE to keep each file's workbooks in a folder
+            named after it
+        workers: Files processed at once; None uses one per CPU
+        use_threads: Use threads instead of processes
+        on_progress: Called as on_progress(index, rows, seconds) in the
+            calling thread when uploads[index] has been processed
+        formats: Files written per department/batch, from OUTPUT_FORMATS
+        
+    Returns:
+        Bytes of the merged department/batch ZIP archive
+    """
+    if merge not in MERGE_MODES:
+        raise ValueError(f"Unknown merge mode: {merge}; choose from {', '.join(MERGE_MODES)}")
+    _check_output_formats(formats)
+    
+    workers = min(workers or os.cpu_count() or 1, len(uploads))
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    results = [None] * len(uploads)
+    start = time.perf_counter()
+    with executor_class(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(_process_upload, data, name.rsplit('.', 1)[-1].lower(),
+                                   merge, formats): index
+                   for index, (name, data) in enumerate(uploads)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index], rows = future.result()
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                raise ValueError(f'{uploads[index][0]}: {e}') from e
+            if on_progress is not None:
+                on_progress(index, rows, time.perf_counter() - start)
+    
+    if merge == MERGE_PER_BATCH:
+        return b''.join(iter_department_zip(merge_marksheets(results), formats=formats))
+    folders = _source_folders([name for name, _ in uploads])
+    return b''.join(iter_merged_zip(list(zip(folders, results))))
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of finished ZIP archives, keyed by a SHA-256 of
+    the uploaded bytes plus CONFIG_VERSION. Entries live in memory and,
+    if cache_dir is given, also on disk so they survive restarts.
+    
+    Args:
+        max_bytes: Total size of archives kept in memory
+        cache_dir: Optional directory for the on-disk tier
+        max_disk_bytes: Total size of archives kept on disk
+    """
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(data: bytes, *options: str) -> str:
+        """Hash the uploaded bytes together with the config version and options."""
+        digest = hashlib.sha256()
+        for part in (CONFIG_VERSION, *options):
+            digest.update(part.encode('utf-8') + b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached archive for key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = f.read()
+            except OSError:
+                return None
+            os.utime(path)  # Mark as recently used for disk eviction
+            self._put_memory(key, value)
+            return value
+        return None
+    
+    def put(self, key: str, value: bytes) -> None:
+        """Store an archive, evicting the least recently used ones if needed."""
+        self._put_memory(key, value)
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+    
+    def _put_memory(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.zip')
+    
+    def _evict_disk(self) -> None:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.zip'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+def get_result_cache() -> ResultCache:
+    """
+    Shared result cache for all sessions of the Streamlit app. Set
+    MARKS_SPLITTING_CACHE_DIR to also keep results on disk.
+    """
+    import streamlit as st
+    return st.cache_resource(_new_result_cache)()
+
+def _new_result_cache() -> ResultCache:
+    return ResultCache(cache_dir=os.environ.get('MARKS_SPLITTING_CACHE_DIR'))
+
+def main():
+    import pandas as pd
+    import streamlit as st
+    st.title("Marksheet Processing and Department-wise Excel Export")
+    
+    # Allow both Excel and CSV files, several at once
+    uploaded_files = st.file_uploader("Upload Marksheet files", type=["xlsx", "csv"],
+                                      accept_multiple_files=True)
+    
+    if uploaded_files:
+        try:
+            # Determine file type and read accordingly
+            for uploaded_file in uploaded_files:
+                file_extension = uploaded_file.name.split('.')[-1].lower()
+                if file_extension not in ('xlsx', 'csv'):
+                    st.error(f"Unsupported file format: {uploaded_file.name}. "
+                             "Please upload .xlsx or .csv files.")
+                    return
+            uploads = [(uploaded_file.name, uploaded_file.getvalue())
+                       for uploaded_file in uploaded_files]
+            
+            merge = MERGE_PER_BATCH
+            if len(uploads) > 1:
+                merge = st.radio("Combine the files", MERGE_MODES,
+                                 format_func=lambda mode: {
+                                     MERGE_PER_BATCH: "One workbook per department and batch",
+                                     MERGE_PER_FILE: "A folder per uploaded file",
+                                 }[mode])
+            
+            formats = DEFAULT_FORMATS
+            if importlib.util.find_spec('pyarrow') is not None:
+                formats = tuple(st.multiselect(
+                    "Output formats", OUTPUT_FORMATS, default=list(DEFAULT_FORMATS),
+                    help="Parquet and Feather keep Internal/External/Total as integers "
+                         "and are much faster to load for analysis")) or DEFAULT_FORMATS
+            
+            incremental = len(uploads) == 1 and st.checkbox(
+                "Only rebuild batches changed since this file was last processed",
+                help="Rows are matched by Register No against the previous upload of a "
+                     "file with the same name in this session")
+            
+            # Reuse the archive if these exact files were processed before
+            cache = get_result_cache()
+            fingerprint = load_register_decoder().fingerprint()
+            if len(uploads) == 1:
+                data = uploads[0][1]
+                options = (file_extension, fingerprint, *formats)
+            else:
+                data = b''.join(hashlib.sha256(name.encode('utf-8') + b'\0' + file_data).digest()
+                                for name, file_data in uploads)
+                options = ('merged', merge, fingerprint, *formats)
+            cache_key = cache.make_key(data, *options)
+            zip_bytes = cache.get(cache_key)
+            
+            # An incremental run needs a snapshot of this file to compare the
+            # next upload against, so build one even if the archive is cached
+            previous_runs = st.session_state.setdefault('previous_runs', {})
+            if incremental and uploads[0][0] not in previous_runs:
+                zip_bytes = None
+            
+            # Stage timings of a single file processed in this run
+            metrics = None
+            if zip_bytes is None and incremental:
+                previous_zip, previous_snapshot = previous_runs.get(uploads[0][0], (None, None))
+                with PipelineMetrics() as metrics:
+                    processed_df = process_excel_file(
+                        read_marksheet(io.BytesIO(data), file_extension))
+                    snapshot, chunks = iter_department_zip_incremental(
+                        processed_df, previous_zip and io.BytesIO(previous_zip),
+                        previous_snapshot, formats=formats)
+                    zip_bytes = b''.join(chunks)
+                cache.put(cache_key, zip_bytes)
+                previous_runs[uploads[0][0]] = (zip_bytes, snapshot)
+                
+                changes = snapshot['changes']
+                st.info(f"{changes['rows_changed']} rows changed, {changes['rows_added']} added "
+                        f"and {changes['rows_removed']} removed: rebuilt "
+                        f"{changes['files_rebuilt']} files, reused {changes['files_reused']}.")
+            
+            elif zip_bytes is None and len(uploads) == 1:
+                with PipelineMetrics() as metrics:
+                    zip_bytes = split_marksheet(data, file_extension, formats)
+                cache.put(cache_key, zip_bytes)
+            
+            elif zip_bytes is None:
+                # Show each file's progress as it finishes
+                progress = st.progress(0.0, text="Processing files...")
+                statuses = [st.empty() for _ in uploads]
+                for (name, _), status in zip(uploads, statuses):
+                    status.text(f"{name}: processing")
+                done = []
+                
+                def on_progress(index, rows, seconds):
+                    done.append(index)
+                    statuses[index].text(f"{uploads[index][0]}: {rows} rows ({seconds:.1f}s)")
+                    progress.progress(len(done) / len(uploads),
+                                      text=f"Processed {len(done)}/{len(uploads)} files")
+                
+                # Streamlit runs this file as __main__, whose functions can't
+                # be sent to worker processes, so the files share threads
+                zip_bytes = split_marksheets(uploads, merge, use_threads=True,
+                                             on_progress=on_progress, formats=formats)
+                cache.put(cache_key, zip_bytes)
+            
+            if metrics is not None:
+                with st.expander("Processing metrics"):
+                    st.dataframe(pd.DataFrame(metrics.as_dict()['stages']))
+                    st.caption("Marks cache: {hits} hits, {misses} misses".format(
+                        **marks_cache_info()))
+            
+            # Provide download button
+            st.download_button(
+                label="Download Department and Batch-wise Excel Files (ZIP)",
+                data=zip_bytes,
+                file_name="department_batch_excel_files.zip",
+                mime="application/zip"
+            )
+            
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark the compression options of the department/batch archive.
+
+Serializes the batch workbooks of a synthetic marksheet once, then times
+zipping them with each method in ZIP_COMPRESSION (and a few deflate
+levels) and reports the archive size. The workbooks are XLSX files, which
+are already deflate-compressed, so recompressing them mostly costs time.
+
+Usage:
+    python benchmarks/bench_compression.py [--rows 50000] [--subjects 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (ZIP_COMPRESSION, _iter_zip, _serialize_batches,  # noqa: E402
+                 compute_column_widths, load_register_decoder,
+                 partition_batches, process_excel_file)
+from synthetic import generate_marksheet  # noqa: E402
+
+# (compression, compresslevel) pairs timed by default
+OPTIONS = [('store', None), ('deflate', 1), ('deflate', 6), ('deflate', 9),
+           ('bzip2', 9), ('lzma', None)] + [('zstd', None)] * ('zstd' in ZIP_COMPRESSION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Best of this many runs per option')
+    args = parser.parse_args()
+
+    df = process_excel_file(generate_marksheet(args.rows, args.subjects))
+    partitions = partition_batches(df, load_register_decoder())
+    entries = list(_serialize_batches(df, partitions, compute_column_widths(df)))
+    raw_size = sum(len(data) for _, data in entries)
+
+    print(f'rows={args.rows} files={len(entries)} xlsx bytes={raw_size}')
+    print(f'{"compression":>12} {"level":>5} {"seconds":>8} {"bytes":>11} {"ratio":>6}')
+    for compression, level in OPTIONS:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in _iter_zip(iter(entries), compression, level))
+            best = min(best, time.perf_counter() - start)
+        print(f'{compression:>12} {level if level is not None else "-":>5} '
+              f'{best:>8.3f} {size:>11} {size / raw_size:>6.3f}')
+
+
+if __name__ == '__main__':
+    main()
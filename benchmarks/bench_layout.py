@@ -0,0 +1,69 @@
+"""
+Benchmark the column-layout step of process_excel_file on wide sheets.
+
+Compares the single-pass layout planner against the old approach of
+calling sheet.insert_cols once per subject, for a growing number of
+subjects at a fixed row count. With the planner the time per subject
+stays flat; with insert_cols it grows with the number of subjects.
+
+Usage:
+    python benchmarks/bench_layout.py [--rows 2000] [--subjects 5 10 15 20 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import process_excel_file, process_marks  # noqa: E402
+from synthetic import generate_marksheet  # noqa: E402
+
+
+def legacy_insert_cols(df: pd.DataFrame, subjects: int) -> None:
+    """The pre-planner layout step: one insert_cols call per subject."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in df.itertuples(index=False):
+        sheet.append(list(row))
+    for subject_num in range(subjects):
+        marks_col = 4 + (subject_num * 7) + 2
+        sheet.insert_cols(marks_col + 1, 3)
+        for row in range(2, sheet.max_row + 1):
+            values = process_marks(sheet.cell(row=row, column=marks_col).value)
+            for offset, value in enumerate(values):
+                sheet.cell(row=row, column=marks_col + 1 + offset, value=value)
+
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--subjects', type=int, nargs='+', default=[5, 10, 15, 20, 30])
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='Only time the layout planner')
+    args = parser.parse_args()
+
+    print(f'rows={args.rows}')
+    print(f'{"subjects":>8} {"planner s":>10} {"ms/subject":>10} '
+          f'{"legacy s":>10} {"ms/subject":>10}')
+    for subjects in args.subjects:
+        df = generate_marksheet(args.rows, subjects)
+        planner = time_call(process_excel_file, df.copy())
+        line = f'{subjects:>8} {planner:>10.3f} {planner / subjects * 1000:>10.2f}'
+        if not args.skip_legacy:
+            legacy = time_call(legacy_insert_cols, df, subjects)
+            line += f' {legacy:>10.3f} {legacy / subjects * 1000:>10.2f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
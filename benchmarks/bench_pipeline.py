@@ -0,0 +1,121 @@
+"""
+End-to-end benchmark of the marks-splitting pipeline.
+
+Generates synthetic marksheets (see synthetic.py) at several sizes and
+times each stage: scalar process_marks over every Marks cell, the
+vectorized split_marks_series, process_excel_file and
+create_department_batches. Peak memory of each stage is measured with
+tracemalloc in a separate pass, so it does not skew the timings. Every
+run starts with a cold Marks cache (see MarksCache in app.py). Results
+are written as JSON so runs can be compared across commits.
+
+Usage:
+    python benchmarks/bench_pipeline.py --rows 1000 10000 100000 1000000 -o results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (create_department_batches, marks_cache_clear,  # noqa: E402
+                 process_excel_file, process_marks, split_marks_series)
+from synthetic import generate_marksheet  # noqa: E402
+
+
+def _marks_columns(raw: pd.DataFrame, subjects: int) -> List[pd.Series]:
+    return [raw[3 + subject * 4 + 2] for subject in range(subjects)]
+
+
+def _stages(raw: pd.DataFrame, subjects: int) -> Dict[str, Callable[[], object]]:
+    """Build the stage callables; each one works on its own copy of the input."""
+    processed = process_excel_file(raw.copy())
+    return {
+        'process_marks': lambda: [process_marks(value)
+                                  for column in _marks_columns(raw, subjects)
+                                  for value in column],
+        'split_marks_series': lambda: [split_marks_series(column)
+                                       for column in _marks_columns(raw, subjects)],
+        'process_excel_file': lambda: process_excel_file(raw.copy()),
+        'create_department_batches': lambda: create_department_batches(processed),
+    }
+
+
+def _time(func: Callable[[], object]) -> float:
+    marks_cache_clear()  # Time every stage with a cold Marks cache
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _peak_memory(func: Callable[[], object]) -> int:
+    marks_cache_clear()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run(rows_list: List[int], subjects: int, stages: List[str],
+        measure_memory: bool = True) -> dict:
+    """Run the benchmark and return the machine-readable results."""
+    results = []
+    for rows in rows_list:
+        raw = generate_marksheet(rows, subjects)
+        stage_funcs = _stages(raw, subjects)
+        for name in stages:
+            result = {'rows': rows, 'subjects': subjects, 'stage': name,
+                      'seconds': round(_time(stage_funcs[name]), 6)}
+            if measure_memory:
+                result['peak_bytes'] = _peak_memory(stage_funcs[name])
+            results.append(result)
+            print(json.dumps(result), file=sys.stderr)
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the marks-splitting pipeline.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--stages', nargs='+',
+                        default=['process_marks', 'split_marks_series',
+                                 'process_excel_file', 'create_department_batches'])
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the tracemalloc pass')
+    parser.add_argument('-o', '--output', help='Write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    report = run(args.rows, args.subjects, args.stages, not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark cold start of the app, CLI and worker processes.
+
+Runs each command in a fresh interpreter under `python -X importtime`
+and reports the best wall time of several runs, the total import time
+and the modules that took longest to import (cumulative, top-level
+packages only). Heavy libraries are imported lazily, so `import app` and
+`cli.py --help` should not load pandas, openpyxl or streamlit at all.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Marksheet with one student of a registered department, to time a whole
+# CLI run on a tiny file that still writes a batch workbook
+TINY_CSV = '2228M0001,Student 1,C001,SUB00,Subject 0,040+043,P\n'
+
+
+def _commands(tiny_csv: str, output_dir: str) -> Dict[str, List[str]]:
+    return {
+        'import app': ['-c', 'import app'],
+        'import cli': ['-c', 'import cli'],
+        'cli.py --help': [os.path.join(ROOT, 'cli.py'), '--help'],
+        'cli.py tiny.csv': [os.path.join(ROOT, 'cli.py'), tiny_csv, '-o', output_dir, '-j', '1'],
+        # What a spawned worker process imports before running a task
+        'worker (spawn)': ['-c', 'import app; app.process_marks("040+043")'],
+    }
+
+
+def _run(args: List[str]) -> Tuple[float, str]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def _import_times(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds of each top-level package from -X importtime output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented further; keep only top-level ones
+        if len(name) - len(name.lstrip()) == 1:
+            package = name.strip().split('.')[0]
+            times[package] = times.get(package, 0) + int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Best of this many runs')
+    parser.add_argument('--top', type=int, default=5, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tiny_csv = os.path.join(tmp, 'tiny.csv')
+        with open(tiny_csv, 'w') as f:
+            f.write(TINY_CSV)
+
+        print(f'{"command":>16} {"wall s":>7} {"imports s":>9}  slowest imports')
+        for name, command in _commands(tiny_csv, tmp).items():
+            runs = [_run(command) for _ in range(args.repeat)]
+            wall, stderr = min(runs)
+            times = _import_times(stderr)
+            slowest = sorted(times.items(), key=lambda item: -item[1])[:args.top]
+            print(f'{name:>16} {wall:>7.3f} {sum(times.values()) / 1e6:>9.3f}  '
+                  + ', '.join(f'{package} {us / 1e6:.3f}' for package, us in slowest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark the XLSX writers used for the batch workbooks.
+
+Builds the department/batch archive of a synthetic marksheet with each
+writer in XLSX_WRITERS (openpyxl write-only and xlsxwriter in
+constant_memory mode) and reports the time taken and the peak memory
+traced while writing, so the default writer can be checked on large files.
+
+Usage:
+    python benchmarks/bench_writers.py [--rows 100000] [--subjects 10]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (XLSX_WRITERS, create_department_batches,  # noqa: E402
+                 process_excel_file)
+from synthetic import generate_marksheet  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--writers', nargs='+', choices=list(XLSX_WRITERS),
+                        default=list(XLSX_WRITERS))
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the tracemalloc pass')
+    args = parser.parse_args()
+
+    df = process_excel_file(generate_marksheet(args.rows, args.subjects))
+    print(f'rows={args.rows} subjects={args.subjects}')
+    print(f'{"writer":>10} {"seconds":>8} {"bytes":>11} {"peak MB":>8}')
+    for writer in args.writers:
+        start = time.perf_counter()
+        size = len(create_department_batches(df, writer=writer).getvalue())
+        seconds = time.perf_counter() - start
+
+        peak = '-'
+        if not args.no_memory:
+            tracemalloc.start()
+            try:
+                create_department_batches(df, writer=writer)
+                peak = f'{tracemalloc.get_traced_memory()[1] / 2**20:.1f}'
+            finally:
+                tracemalloc.stop()
+        print(f'{writer:>10} {seconds:>8.2f} {size:>11} {peak:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Synthetic marksheet generator for benchmarks.
+
+Builds header-less marksheets shaped like the university result exports:
+register numbers made from a batch year, a department code from
+the department registry and a serial number, followed by Code/Name/Marks/Result
+columns per subject with a realistic mix of '040+043', '085', blank and
+absent ('AB') marks.
+
+Usage:
+    python benchmarks/synthetic.py --rows 100000 --subjects 10 -o sheet.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import load_register_decoder  # noqa: E402
+
+BATCH_YEARS = ['21', '22', '23', '24']
+
+# Share of marks cells in each layout: 'III+EEE', 'TTT', blank, 'AB'
+MARKS_MIX = (0.6, 0.25, 0.1, 0.05)
+
+
+def generate_marksheet(rows: int, subjects: int = 10, seed: int = 0,
+                       unknown_dept_rate: float = 0.01) -> pd.DataFrame:
+    """
+    Generate a raw marksheet as read with header=None.
+
+    Args:
+        rows: Number of students
+        subjects: Number of subjects (4 columns each)
+        seed: Random seed, the same seed gives the same sheet
+        unknown_dept_rate: Share of register numbers with an unknown department code
+
+    Returns:
+        DataFrame with integer column labels, like pd.read_excel(header=None)
+    """
+    rng = np.random.default_rng(seed)
+    dept_codes = np.array(list(load_register_decoder().departments) + ['99X'], dtype=object)
+    weights = np.full(len(dept_codes), (1 - unknown_dept_rate) / (len(dept_codes) - 1))
+    weights[-1] = unknown_dept_rate
+
+    serials = np.array([f'{i:04d}' for i in range(10000)], dtype=object)
+    register_no = (np.array(BATCH_YEARS, dtype=object)[rng.integers(0, len(BATCH_YEARS), rows)]
+                   + dept_codes[rng.choice(len(dept_codes), rows, p=weights)]
+                   + serials[np.arange(rows) % 10000])
+    columns = {0: pd.Series(register_no, dtype=object),
+               1: pd.Series([f'Student {i}' for i in range(rows)], dtype=object),
+               2: pd.Series(['C001'] * rows, dtype=object)}
+
+    padded = np.array([f'{i:03d}' for i in range(101)], dtype=object)
+    for subject in range(subjects):
+        internal = padded[rng.integers(0, 51, rows)]
+        external = padded[rng.integers(0, 101, rows)]
+        total = padded[rng.integers(0, 101, rows)]
+        kind = rng.choice(4, rows, p=MARKS_MIX)
+        marks = np.select([kind == 0, kind == 1, kind == 3],
+                          [internal + '+' + external, total, 'AB'], default=None)
+
+        col = 3 + subject * 4
+        columns[col] = pd.Series([f'SUB{subject:02d}'] * rows, dtype=object)
+        columns[col + 1] = pd.Series([f'Subject {subject}'] * rows, dtype=object)
+        columns[col + 2] = pd.Series(marks, dtype=object)
+        columns[col + 3] = pd.Series(np.where(kind == 3, 'AB', 'P'), dtype=object)
+    return pd.DataFrame(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic marksheet.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', required=True, help='.csv or .xlsx path')
+    args = parser.parse_args()
+
+    df = generate_marksheet(args.rows, args.subjects, args.seed)
+    if args.output.lower().endswith('.xlsx'):
+        df.to_excel(args.output, index=False, header=False)
+    else:
+        df.to_csv(args.output, index=False, header=False)
+
+
+if __name__ == '__main__':
+    main()
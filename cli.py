@@ -0,0 +1,293 @@
+"""
+Headless command-line entry point for splitting marksheets.
+
+Runs the same pipeline as the Streamlit app (process_excel_file +
+create_department_batches) on one or more .xlsx/.csv files, or on every
+marksheet in the given directories, and writes one ZIP (or one folder of
+batch workbooks) per input file. Input files are processed concurrently.
+
+Usage:
+    python cli.py marksheets/ extra.xlsx -o output/ --jobs 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from app import (DEFAULT_COMPRESSION, DEFAULT_FORMATS, OUTPUT_FORMATS, XLSX_READERS,
+                 XLSX_WRITERS, ZIP_COMPRESSION, PipelineMetrics,
+                 iter_department_zip, iter_department_zip_incremental,
+                 iter_department_zip_from_csv, iter_department_zip_sqlite,
+                 load_register_decoder,
+                 marks_cache_info, process_excel_file, read_marksheet)
+
+SUPPORTED_EXTENSIONS = ('xlsx', 'csv')
+BACKENDS = ('pandas', 'sqlite')
+
+
+def collect_inputs(paths: List[str], recursive: bool = False) -> List[str]:
+    """
+    Expand the given files and directories into a sorted list of marksheets.
+
+    Args:
+        paths: Files and/or directories given on the command line
+        recursive: Also search subdirectories of the given directories
+
+    Returns:
+        Paths of all .xlsx/.csv files found
+    """
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                inputs.extend(os.path.join(root, name) for name in files
+                              if _extension(name) in SUPPORTED_EXTENSIONS)
+                if not recursive:
+                    break
+        elif os.path.isfile(path):
+            inputs.append(path)
+        else:
+            raise FileNotFoundError(f'No such file or directory: {path}')
+    return sorted(set(inputs))
+
+
+def output_stems(inputs: List[str]) -> List[str]:
+    """
+    Name the output of each marksheet after its file stem. Marksheets that
+    share a stem keep the directories that tell them apart, so
+    sem1/marks.csv and sem2/marks.csv become sem1_marks and sem2_marks;
+    anything still repeated is numbered.
+
+    Args:
+        inputs: Marksheet paths, as returned by collect_inputs
+
+    Returns:
+        A unique output stem for each input, in the same order
+    """
+    paths = [os.path.splitext(os.path.abspath(path))[0] for path in inputs]
+    groups = {}
+    for path in paths:
+        groups.setdefault(os.path.basename(path), []).append(path)
+
+    stems = []
+    for path in paths:
+        stem = os.path.basename(path)
+        if len(groups[stem]) > 1:
+            root = os.path.commonpath([os.path.dirname(p) for p in groups[stem]])
+            stem = os.path.relpath(path, root).replace(os.sep, '_')
+        unique, count = stem, 1
+        while unique in stems:
+            count += 1
+            unique = f'{stem}_{count}'
+        stems.append(unique)
+    return stems
+
+
+def process_file(path: str, output_dir: str, as_folders: bool = False,
+                 workers: int = 1,
+                 width_sample_rows: Optional[int] = None,
+                 engine: Optional[str] = None,
+                 chunk_size: Optional[int] = None,
+                 registry: Optional[str] = None,
+                 compression: str = DEFAULT_COMPRESSION,
+                 compresslevel: Optional[int] = None,
+                 backend: str = 'pandas',
+                 formats: Tuple[str, ...] = DEFAULT_FORMATS,
+                 writer: Optional[str] = None,
+                 incremental: bool = False,
+                 stem: Optional[str] = None) -> Tuple[str, int, float, dict]:
+    """
+    Split one marksheet and write its department/batch output.
+
+    Args:
+        path: Marksheet to process
+        output_dir: Directory receiving the ZIP or folder
+        as_folders: Write the batch workbooks to a folder instead of a ZIP
+        workers: Workers used to serialize the batch workbooks
+        width_sample_rows: Size column widths from only this many leading rows
+        engine: Excel reader to use; defaults to the fastest installed
+        chunk_size: Stream CSV files in chunks of this many rows
+        registry: Department registry file; defaults to departments.json
+        compression: Archive compression, one of ZIP_COMPRESSION
+        compresslevel: Level for deflate (0-9) or bzip2 (1-9)
+        backend: 'pandas', or 'sqlite' to work through an on-disk database
+        formats: Files written per department/batch, from OUTPUT_FORMATS;
+            only the pandas backend without chunk_size writes Parquet/Feather
+        writer: XLSX writer to use; defaults to the fastest installed
+        incremental: Rebuild only the batch files that changed since the
+            previous run into output_dir, using the snapshot saved next to
+            its ZIP
+        stem: Name of the output; defaults to the marksheet's file stem
+
+    Returns:
+        Tuple of (output path, number of rows, seconds taken, stage metrics,
+        Marks cache hits/misses and, if incremental, the changes found)
+    """
+    start = time.perf_counter()
+    decoder = load_register_decoder(registry)
+    cache_before = marks_cache_info()
+    stem = stem or os.path.splitext(os.path.basename(path))[0]
+    zip_path = os.path.join(output_dir, f'{stem}_department_batches.zip')
+    snapshot_path = os.path.join(output_dir, f'{stem}_department_batches.snapshot.json')
+    partial_path = f'{zip_path}.part'
+    snapshot = None
+    with PipelineMetrics() as metrics:
+        if backend == 'sqlite':
+            chunks = iter_department_zip_sqlite(path, _extension(path),
+                                                chunk_size=chunk_size or 50000,
+                                                decoder=decoder, compression=compression,
+                                                compresslevel=compresslevel, writer=writer)
+        elif chunk_size and _extension(path) == 'csv':
+            chunks = iter_department_zip_from_csv(path, chunk_size, decoder,
+                                                  compression, compresslevel, writer)
+        elif incremental:
+            previous_zip = previous_snapshot = None
+            if os.path.exists(zip_path) and os.path.exists(snapshot_path):
+                previous_zip = zip_path
+                with open(snapshot_path) as f:
+                    previous_snapshot = json.load(f)
+            df = read_marksheet(path, _extension(path), engine)
+            snapshot, chunks = iter_department_zip_incremental(
+                process_excel_file(df), previous_zip, previous_snapshot, workers=workers,
+                width_sample_rows=width_sample_rows, decoder=decoder,
+                compression=compression, compresslevel=compresslevel, formats=formats,
+                writer=writer)
+        else:
+            df = read_marksheet(path, _extension(path), engine)
+            chunks = iter_department_zip(process_excel_file(df), workers=workers,
+                                         width_sample_rows=width_sample_rows,
+                                         decoder=decoder, compression=compression,
+                                         compresslevel=compresslevel, formats=formats,
+                                         writer=writer)
+
+        # Stream the archive to disk as each batch workbook is finished; it
+        # replaces the old one only once complete, since an incremental run
+        # copies unchanged files out of the old one while writing
+        try:
+            with open(partial_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except BaseException:
+            os.remove(partial_path)  # Don't leave a truncated archive behind
+            raise
+        if snapshot is None and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)  # It describes the archive being replaced
+        os.replace(partial_path, zip_path)
+        if snapshot is not None:
+            with open(snapshot_path, 'w') as f:
+                json.dump(snapshot, f)
+    rows = metrics.stages['read']['rows']
+    cache_after = marks_cache_info()
+    marks_cache = {key: cache_after[key] - cache_before[key] for key in ('hits', 'misses')}
+
+    output = zip_path
+    if as_folders:
+        output = os.path.join(output_dir, stem)
+        with zipfile.ZipFile(zip_path) as zip_file:
+            zip_file.extractall(output)
+        os.remove(zip_path)
+    report = dict(metrics.as_dict(), marks_cache=marks_cache)
+    if snapshot is not None:
+        report['changes'] = snapshot['changes']
+    return output, rows, time.perf_counter() - start, report
+
+
+def _extension(path: str) -> str:
+    return path.rsplit('.', 1)[-1].lower()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Split marksheets into department and batch-wise Excel files.')
+    parser.add_argument('inputs', nargs='+', help='Marksheet files or directories')
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help='Where to write the output (default: current directory)')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='Search input directories recursively')
+    parser.add_argument('--folders', action='store_true',
+                        help='Write each batch workbook to a folder instead of a ZIP')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of input files processed at once')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Workers serializing batch workbooks within each file')
+    parser.add_argument('--width-sample-rows', type=int, metavar='N',
+                        help='Size column widths from only the first N rows')
+    parser.add_argument('--engine', choices=list(XLSX_READERS),
+                        help='Excel reader (default: fastest installed)')
+    parser.add_argument('--writer', choices=list(XLSX_WRITERS),
+                        help='XLSX writer for the batch workbooks (default: fastest installed)')
+    parser.add_argument('--chunk-size', type=int, metavar='ROWS',
+                        help='Stream CSV files in chunks of ROWS rows to bound memory')
+    parser.add_argument('--registry', metavar='PATH',
+                        help='Department registry (JSON, YAML or CSV; default: departments.json)')
+    parser.add_argument('--compression', choices=list(ZIP_COMPRESSION),
+                        default=DEFAULT_COMPRESSION,
+                        help=f'Archive compression (default: {DEFAULT_COMPRESSION})')
+    parser.add_argument('--compression-level', type=int, metavar='N',
+                        help='Level for deflate (0-9) or bzip2 (1-9)')
+    parser.add_argument('--backend', choices=BACKENDS, default='pandas',
+                        help="'sqlite' processes files larger than memory through "
+                             "an on-disk database (default: pandas)")
+    parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS,
+                        default=list(DEFAULT_FORMATS), dest='formats',
+                        help='Files written per department/batch; parquet and feather '
+                             'need pyarrow (default: xlsx)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Rebuild only the batch files whose rows changed since the '
+                             'previous run into the output directory')
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help='Write per-stage timing and memory for each file as JSON')
+    args = parser.parse_args(argv)
+
+    try:
+        inputs = collect_inputs(args.inputs, args.recursive)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if not inputs:
+        parser.error('No .xlsx or .csv files found')
+    if set(args.formats) != {'xlsx'} and (args.backend == 'sqlite' or args.chunk_size):
+        parser.error('--format parquet/feather needs the pandas backend without --chunk-size')
+    if args.incremental and (args.backend == 'sqlite' or args.chunk_size or args.folders):
+        parser.error('--incremental needs the pandas backend, without --chunk-size or --folders')
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failures = 0
+    report = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(inputs)))) as executor:
+        futures = {executor.submit(process_file, path, args.output_dir,
+                                   args.folders, args.workers,
+                                   args.width_sample_rows, args.engine,
+                                   args.chunk_size, args.registry,
+                                   args.compression, args.compression_level,
+                                   args.backend, tuple(args.formats), args.writer,
+                                   args.incremental, stem): path
+                   for path, stem in zip(inputs, output_stems(inputs))}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                output, rows, seconds, metrics = future.result()
+            except Exception as e:
+                failures += 1
+                print(f'{path}: failed: {e}', file=sys.stderr)
+            else:
+                changes = metrics.get('changes')
+                rebuilt = (f", {changes['files_rebuilt']} files rebuilt, "
+                           f"{changes['files_reused']} reused" if changes else '')
+                print(f'{path}: {rows} rows -> {output} ({seconds:.2f}s{rebuilt})')
+                report[path] = dict(metrics, output=output, seconds=round(seconds, 6))
+
+    print(f'Processed {len(inputs) - failures}/{len(inputs)} files '
+          f'in {time.perf_counter() - start:.2f}s')
+    if args.metrics_json:
+        with open(args.metrics_json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
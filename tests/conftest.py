@@ -0,0 +1,36 @@
+"""
+Shared fixtures for the test suite.
+
+Run from the repository root:
+    python -m pytest -q
+"""
+import io
+import os
+import sys
+import zipfile
+
+import openpyxl
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+def archive_cells(data: bytes) -> dict:
+    """Cell values of every workbook in a department/batch ZIP, by file name."""
+    cells = {}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for name in archive.namelist():
+            workbook = openpyxl.load_workbook(io.BytesIO(archive.read(name)))
+            cells[name] = list(workbook.active.iter_rows(values_only=True))
+    return cells
+
+
+@pytest.fixture
+def marksheet_csv() -> bytes:
+    """A 600-row, 3-subject synthetic marksheet as header-less CSV bytes."""
+    from synthetic import generate_marksheet
+    buffer = io.BytesIO()
+    generate_marksheet(600, 3).to_csv(buffer, header=False, index=False)
+    return buffer.getvalue()
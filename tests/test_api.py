@@ -0,0 +1,58 @@
+"""Tests for the HTTP service."""
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('httpx')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    with TestClient(api.app, raise_server_exceptions=False) as client:
+        # Threads instead of processes, so the worker task can be replaced
+        client.app.state.executor.shutdown()
+        client.app.state.executor = ThreadPoolExecutor(max_workers=1)
+        yield client
+
+
+def _post(client, name: str, data: bytes):
+    return client.post('/split', files={'file': (name, data)})
+
+
+def test_split_returns_the_archive(client, tmp_path, marksheet_csv):
+    response = _post(client, 'marks.csv', marksheet_csv)
+    assert response.status_code == 200
+    assert zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('name, data', [('marks.xlsx', b'not a workbook'),
+                                        ('marks.csv', b''),
+                                        ('marks.csv', b'a,b\nc,d,e,f\n')])
+def test_unreadable_marksheet_is_422(client, tmp_path, name, data):
+    assert _post(client, name, data).status_code == 422
+    assert os.listdir(tmp_path) == []
+
+
+def test_internal_error_is_500(client, tmp_path, monkeypatch, marksheet_csv):
+    def broken(data, file_extension, path):
+        raise RuntimeError('bug')
+    monkeypatch.setattr(api, '_write_marksheet_zip', broken)
+    assert _post(client, 'marks.csv', marksheet_csv).status_code == 500
+    assert os.listdir(tmp_path) == []
+
+
+def test_worker_does_not_recreate_a_removed_file(tmp_path, marksheet_csv):
+    path = str(tmp_path / 'cancelled.zip')
+    with pytest.raises(FileNotFoundError):
+        api._write_marksheet_zip(marksheet_csv, 'csv', path)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,55 @@
+"""Tests for reading CSV marksheets whole and in chunks."""
+import io
+
+import pandas as pd
+import pytest
+
+from app import (_read_marksheet_csv, create_department_batches,
+                 iter_department_zip_from_csv, iter_department_zip_sqlite,
+                 process_excel_file, process_marks, read_marksheet)
+from conftest import archive_cells
+
+# Numeric marks that pd.read_csv types as numbers, one student each
+NUMERIC_MARKS = ['85.5', '1e2', '085', ' 85']
+NUMERIC_CSV = ''.join(f'2228M{i:04d},Student {i},C001,SUB00,Subject 0,{marks},P\n'
+                      for i, marks in enumerate(NUMERIC_MARKS)).encode()
+
+
+def _baseline_totals(data: bytes) -> list:
+    raw = pd.read_csv(io.BytesIO(data), header=None)
+    return [process_marks(value)[2] for value in raw[5]]
+
+
+def test_numeric_marks_keep_their_totals():
+    expected = _baseline_totals(NUMERIC_CSV)
+    assert expected == [85, 100, 85, 85]
+    
+    whole = process_excel_file(read_marksheet(io.BytesIO(NUMERIC_CSV), 'csv'))
+    assert whole['Total 1'].tolist() == expected
+    
+    chunks = [process_excel_file(chunk)
+              for chunk in _read_marksheet_csv(io.BytesIO(NUMERIC_CSV), chunk_size=1)]
+    assert pd.concat(chunks)['Total 1'].tolist() == expected
+    
+    archive = b''.join(iter_department_zip_sqlite(io.BytesIO(NUMERIC_CSV), 'csv'))
+    [rows] = archive_cells(archive).values()
+    assert [row[rows[0].index('Total 1')] for row in rows[1:]] == expected
+
+
+def test_marks_parse_the_same_in_every_chunk():
+    # '085' alone in the first chunk, next to pairs in the second
+    lines = [f'2228M{i:04d},S{i},C001,SUB00,Subject 0,{"085" if i < 100 else "040+043"},P'
+             for i in range(200)]
+    data = ('\n'.join(lines) + '\n').encode()
+    chunks = list(_read_marksheet_csv(io.BytesIO(data), chunk_size=100))
+    whole = read_marksheet(io.BytesIO(data), 'csv')
+    assert pd.concat(chunks)[5].tolist() == whole[5].tolist()
+    assert whole[5].iloc[0] == 85
+
+
+@pytest.mark.parametrize('chunk_size', [100, 256])
+def test_chunked_archive_matches_whole_file(marksheet_csv, chunk_size):
+    df = process_excel_file(read_marksheet(io.BytesIO(marksheet_csv), 'csv'))
+    whole = create_department_batches(df, width_sample_rows=chunk_size).getvalue()
+    chunked = b''.join(iter_department_zip_from_csv(io.BytesIO(marksheet_csv), chunk_size))
+    assert chunked == whole
@@ -0,0 +1,63 @@
+"""Tests for rebuilding only the batch files that changed."""
+import io
+import zipfile
+
+import pytest
+
+from app import (create_department_batches, iter_department_zip_incremental,
+                 process_excel_file)
+from synthetic import generate_marksheet
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return generate_marksheet(300, 2)
+
+
+def _build(raw, previous_zip=None, previous_snapshot=None):
+    snapshot, chunks = iter_department_zip_incremental(
+        process_excel_file(raw.copy()), previous_zip and io.BytesIO(previous_zip),
+        previous_snapshot)
+    return snapshot, b''.join(chunks)
+
+
+def test_first_run_matches_full_build(raw):
+    snapshot, data = _build(raw)
+    assert data == create_department_batches(process_excel_file(raw.copy())).getvalue()
+    assert snapshot['changes']['files_reused'] == 0
+
+
+@pytest.mark.parametrize('mark', ['050+050', '085', 85, 85.5])
+def test_one_cell_rebuilds_only_its_batch(raw, mark):
+    snapshot, data = _build(raw)
+    revised = raw.copy()
+    revised.iloc[10, 5] = mark
+    new_snapshot, new_data = _build(revised, data, snapshot)
+    
+    changes = new_snapshot['changes']
+    assert (changes['rows_changed'], changes['files_rebuilt']) == (1, 1)
+    assert new_data == create_department_batches(process_excel_file(revised.copy())).getvalue()
+
+
+def test_type_only_change_is_rebuilt(raw):
+    revised = raw.copy()
+    revised.iloc[10, 5] = '85'
+    snapshot, data = _build(revised)
+    revised.iloc[10, 5] = 85
+    new_snapshot, new_data = _build(revised, data, snapshot)
+    assert new_snapshot['changes']['files_rebuilt'] == 1
+    assert new_data == create_department_batches(process_excel_file(revised.copy())).getvalue()
+
+
+def test_archive_not_matching_snapshot_is_rebuilt(raw):
+    snapshot, _ = _build(raw)
+    revised = raw.copy()
+    revised.iloc[:, 5] = '001+001'
+    # An archive written by another run, next to this run's snapshot
+    _, other = _build(revised)
+    new_snapshot, data = _build(raw, other, snapshot)
+    assert new_snapshot['changes']['files_reused'] == 0
+    assert data == create_department_batches(process_excel_file(raw.copy())).getvalue()
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert {info.filename: (info.CRC, info.file_size) for info in archive.infolist()} == {
+            name: (entry['crc'], entry['size']) for name, entry in new_snapshot['files'].items()}
@@ -0,0 +1,43 @@
+"""Tests for parsing Marks values."""
+import pandas as pd
+import pytest
+
+from app import _process_marks_int64, process_marks, split_marks_series
+
+EDGE_CASES = [
+    '040+043', '040', '085', ' 85', '85 ', '+043', '040+', '1+2+3', '40 + 43',
+    '٨٥', '٠٤٠+٠٤٣', 'AB', 'abc', '', None, float('nan'), pd.NA,
+    0, 0.0, 85, 85.5, -3, 1e2, True, '0', '000', '000+000',
+    '123456789012345678', '9223372036854775807', '9999999999999999999',
+    '12345678901234567890',
+    '9999999999+1', 2.0**63, float('inf'),
+]
+
+
+def _expected(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return (None, None, None)
+    return _process_marks_int64(value)
+
+
+@pytest.mark.parametrize('value', EDGE_CASES, ids=repr)
+def test_split_marks_series_matches_process_marks(value):
+    split = split_marks_series(pd.Series([value], dtype=object))
+    row = tuple(None if pd.isna(v) else int(v) for v in split.iloc[0])
+    assert row == _expected(value)
+
+
+def test_whole_column_matches_row_by_row():
+    values = pd.Series(EDGE_CASES * 3, dtype=object)
+    split = split_marks_series(values)
+    for position, value in enumerate(values):
+        row = tuple(None if pd.isna(v) else int(v) for v in split.iloc[position])
+        assert row == _expected(value)
+    assert list(split.index) == list(values.index)
+
+
+@pytest.mark.parametrize('value', ['9999999999999999999', '12345678901234567890', 2.0**63])
+def test_marks_too_large_for_int64_are_blank(value):
+    assert process_marks(value)[2] is not None
+    split = split_marks_series(pd.Series([value], dtype=object))
+    assert split.isna().all(axis=None)
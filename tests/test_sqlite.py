@@ -0,0 +1,57 @@
+"""Tests for the SQLite backend against the pandas pipeline."""
+import datetime
+import io
+import warnings
+
+import openpyxl
+import pytest
+
+from app import (create_department_batches, iter_department_zip_sqlite,
+                 process_excel_file, read_marksheet)
+from conftest import archive_cells
+
+
+def _pandas_archive(data: bytes, file_extension: str) -> bytes:
+    df = process_excel_file(read_marksheet(io.BytesIO(data), file_extension))
+    return create_department_batches(df).getvalue()
+
+
+def _typed_xlsx() -> bytes:
+    """Marksheet with date, time, datetime and TRUE/FALSE cells, some in Marks."""
+    workbook = openpyxl.Workbook()
+    marks = ['040+043', True, datetime.date(2020, 1, 1), '085', False, 85]
+    for i, mark in enumerate(marks):
+        workbook.active.append([f'2228M{i:04d}', f'Student {i}', datetime.datetime(2020, 1, 2 + i),
+                                'SUB00', 'Subject 0', mark, i % 2 == 0,
+                                datetime.time(10, i), datetime.datetime(2021, 3, 4, 5, 6, i)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_csv_archive_matches_pandas(marksheet_csv):
+    sqlite = b''.join(iter_department_zip_sqlite(io.BytesIO(marksheet_csv), 'csv',
+                                                 chunk_size=128))
+    assert sqlite == _pandas_archive(marksheet_csv, 'csv')
+
+
+def test_xlsx_typed_cells_round_trip():
+    data = _typed_xlsx()
+    with warnings.catch_warnings():
+        # sqlite3's default datetime adapter is deprecated; it must not be used
+        warnings.simplefilter('error', DeprecationWarning)
+        sqlite = b''.join(iter_department_zip_sqlite(io.BytesIO(data), 'xlsx'))
+    expected = _pandas_archive(data, 'xlsx')
+    assert archive_cells(sqlite) == archive_cells(expected)
+    assert sqlite == expected
+    
+    [rows] = archive_cells(sqlite).values()
+    assert isinstance(rows[1][2], datetime.datetime)
+    assert rows[1][-3] is True and rows[2][-3] is False
+
+
+@pytest.mark.parametrize('db_path', [None, 'marks.sqlite3'])
+def test_db_path_is_optional(tmp_path, marksheet_csv, db_path):
+    path = None if db_path is None else str(tmp_path / db_path)
+    sqlite = b''.join(iter_department_zip_sqlite(io.BytesIO(marksheet_csv), 'csv', path))
+    assert sqlite == _pandas_archive(marksheet_csv, 'csv')